@@ -6,9 +6,17 @@ DeepSeek适配器
 """
 
 import os
-from typing import Dict, Any
-from .llm_base import LLMAdapter
-from openai import OpenAI
+import sys
+from typing import Dict, Any, Optional
+from .llm_base import HOLD_API_FAIL, JsonObjectScanner, LLMAdapter, prompt_cache_key, stream_enabled, usage_log_enabled
+from openai import AsyncOpenAI, OpenAI
+
+
+# 系统提示词（模块级常量，同时参与响应缓存键的构造）
+SYSTEM_PROMPT = sys.intern("你是专业的量化交易分析师。严格遵守：仅输出JSON，无任何额外文字或代码块。若置信度不足或无法满足交易所最小名义额/最小数量，必须返回HOLD或空方案；禁止同时对同一symbol买卖；理由需与输入数据直接相关。优先输出组合方案：{\"buys\": [ { \"symbol\": \"<BASE>USDT\", \"quote_usdt\": <number> } , ... ], \"sells\": [ { \"symbol\": \"<BASE>USDT\", \"quantity\": <number> } , ... ], \"rationale\": \"<简要理由>\", \"confidence\": <0.0-1.0>}；若无法生成组合方案，退回旧格式 {\"symbol\": \"<BASE>USDT|null\", \"action\": \"BUY|SELL|HOLD\", \"confidence\": 0.0-1.0, \"rationale\": \"简短理由\" }")
+
+# 预构建的system消息（只读，所有请求共用），每次调用只需构造user消息
+_SYSTEM_MSG = {"role": "system", "content": SYSTEM_PROMPT}
 
 
 class DeepSeekAdapter(LLMAdapter):
@@ -29,6 +37,10 @@ class DeepSeekAdapter(LLMAdapter):
         
         super().__init__(api_key)
         
+        self.model = "deepseek-chat"
+        self.system_prompt = SYSTEM_PROMPT
+        self.max_tokens = 400
+        
         # 采样参数（可通过环境变量配置）
         try:
             self.temperature = float(os.getenv('DEEPSEEK_TEMPERATURE', '0.2'))
@@ -41,26 +53,123 @@ class DeepSeekAdapter(LLMAdapter):
         
         # 使用OpenAI SDK并指向DeepSeek的base_url
         self.client = OpenAI(api_key=self.api_key, base_url="https://api.deepseek.com")
+        self.aclient = AsyncOpenAI(api_key=self.api_key, base_url="https://api.deepseek.com")
+    
+    def _request_kwargs(self, prompt: str) -> Dict[str, Any]:
+        """构造chat.completions请求参数（同步与异步调用共用）"""
+        kwargs = {
+            "model": self.model,
+            "messages": [_SYSTEM_MSG, {"role": "user", "content": prompt}],
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+        }
+        # DeepSeek对相同前缀自动做上下文缓存；配置了LLM_PROMPT_CACHE_KEY时额外发送路由提示
+        cache_key = prompt_cache_key()
+        if cache_key:
+            kwargs["extra_body"] = {"prompt_cache_key": cache_key}
+        return kwargs
+    
+    def _handle_response(self, prompt: str, response: Any) -> str:
+        content = response.choices[0].message.content.strip()
+        self._log_usage(getattr(response, 'usage', None))
+        self._cache_store(prompt, content)
+        return content
+    
+    def _stream_kwargs(self, prompt: str) -> Dict[str, Any]:
+        """流式请求参数：要求服务端在末尾追加一个只含usage的分片（choices为空）"""
+        return dict(self._request_kwargs(prompt), stream=True, stream_options={"include_usage": True})
+    
+    def _call_stream(self, prompt: str) -> Optional[str]:
+        """
+        流式调用：顶层JSON对象一完整即关闭连接，不再等待（和计费）剩余token
+        LLM_LOG_USAGE=1 时改为读到末尾的usage分片再关闭，以便打印前缀缓存命中（代价是等待剩余输出）
+        """
+        stream = self.client.chat.completions.create(**self._stream_kwargs(prompt))
+        scanner = JsonObjectScanner()
+        usage = None
+        want_usage = usage_log_enabled()
+        done = False
+        try:
+            for chunk in stream:
+                usage = getattr(chunk, 'usage', None) or usage
+                if usage is not None and not chunk.choices:
+                    break
+                piece = chunk.choices[0].delta.content if chunk.choices and not done else None
+                if piece and scanner.feed(piece):
+                    done = True
+                    if not want_usage:
+                        break
+        finally:
+            stream.close()
+        self._log_usage(usage)
+        return scanner.result() or None
+    
+    async def _acall_stream(self, prompt: str) -> Optional[str]:
+        """异步流式调用，逻辑同_call_stream"""
+        stream = await self.aclient.chat.completions.create(**self._stream_kwargs(prompt))
+        scanner = JsonObjectScanner()
+        usage = None
+        want_usage = usage_log_enabled()
+        done = False
+        try:
+            async for chunk in stream:
+                usage = getattr(chunk, 'usage', None) or usage
+                if usage is not None and not chunk.choices:
+                    break
+                piece = chunk.choices[0].delta.content if chunk.choices and not done else None
+                if piece and scanner.feed(piece):
+                    done = True
+                    if not want_usage:
+                        break
+        finally:
+            await stream.close()
+        self._log_usage(usage)
+        return scanner.result() or None
     
     def call(self, prompt: str) -> str:
         """
-        调用DeepSeek API
+        调用DeepSeek API（相同请求优先命中响应缓存；默认流式，失败时退回普通请求）
+        """
+        cached = self._cache_lookup(prompt)
+        if cached is not None:
+            return cached
+        if stream_enabled():
+            try:
+                content = self._call_stream(prompt)
+                if content:
+                    self._cache_store(prompt, content)
+                    return content
+            except Exception as e:
+                print(f"⚠️ DeepSeek流式调用失败，改用普通请求: {e}")
+        try:
+            response = self.client.chat.completions.create(**self._request_kwargs(prompt))
+            return self._handle_response(prompt, response)
+        except Exception as e:
+            print(f"❌ DeepSeek API调用失败: {e}")
+            return HOLD_API_FAIL
+    
+    async def acall(self, prompt: str) -> str:
+        """
+        异步调用DeepSeek API（AsyncOpenAI），便于多个模型并发请求
         """
+        cached = await self._acache_lookup(prompt)
+        if cached is not None:
+            return cached
+        if stream_enabled():
+            try:
+                content = await self._acall_stream(prompt)
+                if content:
+                    self._cache_store(prompt, content)
+                    return content
+            except Exception as e:
+                print(f"⚠️ DeepSeek流式调用失败，改用普通请求: {e}")
         try:
-            response = self.client.chat.completions.create(
-                model="deepseek-chat",
-                messages=[
-                    {"role": "system", "content": "你是专业的量化交易分析师。严格遵守：仅输出JSON，无任何额外文字或代码块。若置信度不足或无法满足交易所最小名义额/最小数量，必须返回HOLD或空方案；禁止同时对同一symbol买卖；理由需与输入数据直接相关。优先输出组合方案：{\"buys\": [ { \"symbol\": \"<BASE>USDT\", \"quote_usdt\": <number> } , ... ], \"sells\": [ { \"symbol\": \"<BASE>USDT\", \"quantity\": <number> } , ... ], \"rationale\": \"<简要理由>\", \"confidence\": <0.0-1.0>}；若无法生成组合方案，退回旧格式 {\"symbol\": \"<BASE>USDT|null\", \"action\": \"BUY|SELL|HOLD\", \"confidence\": 0.0-1.0, \"rationale\": \"简短理由\" }"},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=400,
-                temperature=self.temperature,
-                top_p=self.top_p
-            )
-            return response.choices[0].message.content.strip()
+            response = await self.aclient.chat.completions.create(**self._request_kwargs(prompt))
+            return self._handle_response(prompt, response)
         except Exception as e:
             print(f"❌ DeepSeek API调用失败: {e}")
-            return '{"symbol": null, "action": "HOLD", "confidence": 0.0, "rationale": "API调用失败"}'
+            return HOLD_API_FAIL
     
     def get_model_name(self) -> str:
         """获取模型名称"""
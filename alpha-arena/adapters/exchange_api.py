@@ -7,8 +7,16 @@
 
 import os
 import sys
+import json
+import time
+import random
+import threading
 import requests
-from typing import Dict, List
+import urllib3
+import numpy as np
+from decimal import Decimal, ROUND_DOWN
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 try:
     from binance.client import Client as BinanceClient
@@ -18,6 +26,97 @@ except ImportError:
     BinanceClient = None
     BinanceAPIException = Exception
 
+# 行情接口响应体较大（全量ticker/K线），orjson解析更快；未安装时沿用SDK自带的json解析
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# 进程级/klines在途请求上限：多个ExchangeAPI实例或并行的行情任务共享，避免瞬时请求过多触发限频
+try:
+    KLINES_MAX_INFLIGHT = max(1, int(os.getenv('BINANCE_KLINES_MAX_INFLIGHT', '10')))
+except Exception:
+    KLINES_MAX_INFLIGHT = 10
+_klines_slots = threading.BoundedSemaphore(KLINES_MAX_INFLIGHT)
+
+# SDK客户端进程级复用 {(api_key, api_secret, timeout): Client}：客户端持有的requests会话及其长连接池跨轮保留，
+# 避免每轮新建ExchangeAPI时重新建立TCP+TLS连接（SDK在客户端析构时会关闭会话，因此复用客户端而非单独共享会话）
+_CLIENTS: Dict[Tuple[str, str, int], object] = {}
+_clients_lock = threading.Lock()
+
+# 交易对信息进程级缓存 {symbol: (缓存时间, info)}：每轮运行都会新建ExchangeAPI，放在模块级以便跨轮复用
+_SYMBOL_INFO_CACHE: Dict[str, Tuple[float, Dict]] = {}
+# exchangeInfo中不存在的交易对 {symbol: 确认时间}：TTL内不再为其重复拉取全量exchangeInfo或单独请求
+_SYMBOL_INFO_MISSES: Dict[str, float] = {}
+# 全量exchangeInfo的最近加载时间与加载锁（进程级，并发下单/跨轮只需一个线程拉取）
+_symbol_info_loaded_at = 0.0
+_symbol_info_lock = threading.Lock()
+# quoteOrderQty量化器缓存 {symbol: (精度, Decimal量化器)}，随交易对信息一并构建，跨轮复用
+_QUANTIZER_CACHE: Dict[str, Tuple[int, Decimal]] = {}
+# 交易对信息磁盘缓存（每个交易对一个 {symbol}.json）：过滤器日内几乎不变，跨进程/跨运行复用；TTL<=0 关闭
+SYMBOL_INFO_DIR = os.getenv('BINANCE_SYMBOL_INFO_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache', 'symbol_info'))
+try:
+    SYMBOL_INFO_DISK_TTL = float(os.getenv('BINANCE_SYMBOL_INFO_DISK_TTL', '86400'))
+except Exception:
+    SYMBOL_INFO_DISK_TTL = 86400.0
+
+# 交易所不存在/已下架的交易对（进程级）：会导致按列表批量查询价格被整体拒绝；每轮都会新建ExchangeAPI，
+# 放在模块级以便跨轮排除，只需在首次遇到时退回一次全量行情
+_UNKNOWN_TICKER_SYMBOLS: set = set()
+_unknown_ticker_lock = threading.Lock()
+
+
+def _symbol_info_path(symbol: str) -> Optional[str]:
+    # 交易对名仅由字母数字组成，其他取值不落盘，避免拼出非预期路径
+    if SYMBOL_INFO_DISK_TTL <= 0 or not symbol or not symbol.isalnum():
+        return None
+    return os.path.join(SYMBOL_INFO_DIR, f"{symbol}.json")
+
+
+def _read_symbol_info_file(symbol: str) -> Optional[Dict]:
+    """读取磁盘缓存的交易对信息（{"ts": 写入时间, "data": info}），缺失、过期或损坏时返回None"""
+    path = _symbol_info_path(symbol)
+    if path is None:
+        return None
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read()
+        envelope = orjson.loads(raw) if orjson is not None else json.loads(raw.decode('utf-8'))
+        data = envelope['data']
+        if time.time() - float(envelope['ts']) < SYMBOL_INFO_DISK_TTL and isinstance(data, dict) and data:
+            return data
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def _write_symbol_info_file(symbol: str, info: Dict) -> None:
+    """写入磁盘缓存（先写临时文件再替换，避免并发读到残缺文件），失败时忽略"""
+    path = _symbol_info_path(symbol)
+    if path is None:
+        return
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(SYMBOL_INFO_DIR, exist_ok=True)
+        envelope = {"ts": time.time(), "data": info}
+        with open(tmp, 'wb') as f:
+            f.write(orjson.dumps(envelope) if orjson is not None else json.dumps(envelope, ensure_ascii=False).encode('utf-8'))
+        os.replace(tmp, path)
+    except (OSError, TypeError, ValueError):
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+class RetryExhausted(Exception):
+    """网络异常/时间戳错误重试次数耗尽"""
+
+
+class OrderStatusUnknown(Exception):
+    """真实下单的请求可能已送达交易所（读超时/连接中断/5xx），执行状态未知，不能重试"""
+
 
 class ExchangeAPI:
     """交易所API适配器"""
@@ -27,6 +126,44 @@ class ExchangeAPI:
         if BinanceClient is None:
             raise ImportError("BinanceClient未找到，请安装python-binance")
         
+        # 历史K线并发请求数（按交易对并发拉取，总耗时≈单次最慢请求）
+        try:
+            self.klines_concurrency = max(1, int(os.getenv('BINANCE_KLINES_CONCURRENCY', '8')))
+        except Exception:
+            self.klines_concurrency = 8
+        # 批量下单并发数（多笔订单并发提交，总耗时≈单笔最慢订单）
+        try:
+            self.order_concurrency = max(1, int(os.getenv('BINANCE_ORDER_CONCURRENCY', '4')))
+        except Exception:
+            self.order_concurrency = 4
+        # 交易对信息缓存（进程级共享）；交易所过滤器极少变化，按TTL复用，过期后先查磁盘缓存
+        try:
+            self.symbol_info_ttl = float(os.getenv('BINANCE_SYMBOL_INFO_TTL', '3600'))
+        except Exception:
+            self.symbol_info_ttl = 3600.0
+        self._symbol_info_cache = _SYMBOL_INFO_CACHE
+        self._quantizer_cache = _QUANTIZER_CACHE
+        # 逐交易对的成功日志仅在 EXCHANGE_VERBOSE=1（或DEBUG=1）时输出，默认每次批量请求只打印一行汇总
+        self.debug = os.getenv('EXCHANGE_VERBOSE', '0').strip() == '1' or os.getenv('DEBUG', '0').strip() == '1'
+        # 账户快照缓存 (缓存时间, {asset: {"free": x, "locked": y}})；同一决策周期内的多次余额查询共用一次请求
+        try:
+            self.account_ttl = float(os.getenv('BINANCE_ACCOUNT_TTL', '2'))
+        except Exception:
+            self.account_ttl = 2.0
+        self._account_cache: Optional[Tuple[float, Dict[str, Dict[str, float]]]] = None
+        # 签名请求的recvWindow（放宽时间窗口，降低-1021错误概率，币安上限60000）与重试次数
+        try:
+            self.recv_window = min(int(os.getenv('BINANCE_RECVWINDOW', '60000')), 60000)
+        except Exception:
+            self.recv_window = 60000
+        try:
+            self.retry_attempts = max(1, int(os.getenv('BINANCE_RETRY_ATTEMPTS', '2')))
+        except Exception:
+            self.retry_attempts = 2
+        # 共享的时间偏移估计：并发请求同时遇到-1021时只重同步一次
+        self._clock_skew_ts = 0.0
+        self._clock_lock = threading.Lock()
+        
         try:
             api_key = os.getenv('BINANCE_API_KEY')
             api_secret = os.getenv('BINANCE_API_SECRET')
@@ -34,7 +171,8 @@ class ExchangeAPI:
             if not api_key or not api_secret:
                 raise ValueError("币安API密钥未设置，请设置BINANCE_API_KEY和BINANCE_API_SECRET环境变量")
             
-            self.client = BinanceClient(api_key, api_secret, requests_params={'timeout': int(os.getenv('BINANCE_HTTP_TIMEOUT_SEC', '10') or '10')})
+            self.http_timeout = int(os.getenv('BINANCE_HTTP_TIMEOUT_SEC', '10') or '10')
+            self.client = self._shared_client(api_key, api_secret, self.order_concurrency)
             # 同步时间偏移，降低-1021错误概率
             try:
                 server_time = self.client.get_server_time()
@@ -42,6 +180,7 @@ class ExchangeAPI:
                     import time
                     # 使用正确的属性名timestamp_offset以与python-binance兼容
                     self.client.timestamp_offset = int(server_time['serverTime']) - int(time.time() * 1000)
+                    self._clock_skew_ts = time.time()
                     print(f"⏱️ 与服务器时间偏移: {getattr(self.client, 'timestamp_offset', 0)} ms")
             except Exception as te:
                 print(f"⚠️ 时间同步失败: {te}")
@@ -50,6 +189,40 @@ class ExchangeAPI:
             print(f"❌ 币安API客户端初始化失败: {e}")
             self.client = None
     
+    def _shared_client(self, api_key: str, api_secret: str, order_workers: int):
+        """获取进程级复用的SDK客户端；首次创建时配置连接池，之后直接复用已建立的长连接"""
+        key = (api_key, api_secret, self.http_timeout)
+        with _clients_lock:
+            client = _CLIENTS.get(key)
+            if client is None:
+                client = BinanceClient(api_key, api_secret, requests_params={'timeout': self.http_timeout})
+                self.client = client
+                self._tune_http_session(order_workers)
+                _CLIENTS[key] = client
+        return client
+    
+    def _tune_http_session(self, order_workers: int) -> None:
+        """
+        扩大SDK会话的连接池并保持长连接：requests默认每个主机只保留10个连接，
+        并发拉取K线+并发下单时超出的连接会被丢弃，下次请求需重新TCP+TLS握手
+        """
+        session = getattr(self.client, 'session', None)
+        if session is None:
+            return
+        try:
+            pool_size = int(os.getenv('BINANCE_HTTP_POOL', '0') or '0')
+        except Exception:
+            pool_size = 0
+        if pool_size <= 0:
+            pool_size = max(32, self.klines_concurrency + order_workers)
+        try:
+            # 重试由_with_retry统一处理，连接层不再重试
+            adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+            session.mount('https://', adapter)
+            session.headers['Connection'] = 'keep-alive'
+        except Exception as e:
+            print(f"⚠️ HTTP连接池配置失败: {e}")
+    
     def get_latest_prices(self, symbols: List[str]) -> Dict[str, float]:
         """
         获取多个代币的最新价格
@@ -64,25 +237,41 @@ class ExchangeAPI:
             print("❌ API客户端未初始化")
             return {symbol: 0.0 for symbol in symbols}
         
-        prices = {}
+        if not symbols:
+            return {}
         
+        started = time.perf_counter()
         try:
-            # 使用币安API获取所有交易对的价格
-            tickers = self.client.get_all_tickers()
-            ticker_dict = {ticker['symbol']: float(ticker['price']) for ticker in tickers}
-            
-            for symbol in symbols:
-                if symbol in ticker_dict:
-                    price = ticker_dict[symbol]
-                    prices[symbol] = price
-                    print(f"✅ {symbol}: ${price:.4f}")
+            with _unknown_ticker_lock:
+                query = [s for s in symbols if s not in _UNKNOWN_TICKER_SYMBOLS]
+            try:
+                # 仅查询需要的交易对（/ticker/price?symbols=[...]），避免下载全部交易对行情
+                params = {'symbols': json.dumps(query, separators=(',', ':'))}
+                if not query:
+                    tickers = []
+                elif self._fast_json_enabled():
+                    tickers = self._public_get('ticker/price', params)
                 else:
-                    print(f"❌ 未找到{symbol}的价格信息")
-                    prices[symbol] = 0.0
+                    tickers = self.client.get_symbol_ticker(**params)
+            except Exception as qe:
+                # 列表中含无效交易对时整批请求会被拒绝，退回全量行情并记住无效交易对
+                print(f"⚠️ 按交易对查询价格失败，改用全量行情: {qe}")
+                tickers = self.client.get_all_tickers()
+                listed = {t['symbol'] for t in tickers}
+                with _unknown_ticker_lock:
+                    _UNKNOWN_TICKER_SYMBOLS.update(s for s in symbols if s not in listed)
+            fetched = {t['symbol']: float(t['price']) for t in tickers}
         except Exception as e:
             print(f"❌ 获取价格失败: {e}")
             return {symbol: 0.0 for symbol in symbols}
         
+        prices = {symbol: fetched.get(symbol, 0.0) for symbol in symbols}
+        for symbol, price in prices.items():
+            if symbol not in fetched:
+                print(f"❌ 未找到{symbol}的价格信息")
+            elif self.debug:
+                print(f"✅ {symbol}: ${price:.4f}")
+        print(f"✅ 获取最新价格 {len(fetched.keys() & prices.keys())}/{len(symbols)} 个交易对，耗时{(time.perf_counter() - started) * 1000:.0f}ms")
         return prices
     
     def get_single_price(self, symbol: str) -> float:
@@ -139,9 +328,26 @@ class ExchangeAPI:
         Returns:
             历史价格序列字典，格式为{symbol: [p1, p2, ..., pn]}
         """
+        klines = self.get_historical_klines(symbols, interval=interval, limit=limit)
+        return {symbol: closes.tolist() for symbol, (_, closes) in klines.items()}
+    
+    def get_historical_klines(self, symbols: List[str], interval: str = '3m', limit: int = 10,
+                              start_times: Optional[Dict[str, int]] = None) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """
+        并发获取多个代币的K线，返回(开盘时间int64数组, 收盘价float64数组)，按时间从旧到新
+        
+        Args:
+            symbols: 代币符号列表
+            interval: K线周期
+            limit: 每个交易对最多返回的K线条数
+            start_times: 可选，{symbol: 开盘时间(ms)}，仅拉取该时间及之后的K线（增量更新）
+        Returns:
+            {symbol: (open_times, closes)}，获取失败的交易对为空数组
+        """
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
         if self.client is None:
             print("❌ API客户端未初始化")
-            return {symbol: [] for symbol in symbols}
+            return {symbol: empty for symbol in symbols}
         
         # 将字符串周期映射到Binance SDK常量
         interval_map = {
@@ -155,37 +361,168 @@ class ExchangeAPI:
             '1d': BinanceClient.KLINE_INTERVAL_1DAY,
         }
         interval_const = interval_map.get(interval, BinanceClient.KLINE_INTERVAL_3MINUTE)
+        start_times = start_times or {}
         
-        series: Dict[str, List[float]] = {}
+        series: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        started = time.perf_counter()
         try:
-            for symbol in symbols:
-                try:
-                    klines = self.client.get_klines(symbol=symbol, interval=interval_const, limit=limit)
-                    # kline结构: [open_time, open, high, low, close, volume, close_time, ...]
-                    closes = [float(k[4]) for k in klines]
-                    series[symbol] = closes
-                    print(f"✅ {symbol} 历史K线获取成功: {len(closes)} 条")
-                except Exception as se:
-                    print(f"❌ 获取{symbol}历史K线失败: {se}")
-                    series[symbol] = []
+            workers = max(1, min(len(symbols), self.klines_concurrency))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(self._fetch_klines, symbol, interval_const, limit, start_times.get(symbol))
+                           for symbol in symbols]
+                # 按输入顺序收集结果，保持返回字典的交易对顺序
+                for symbol, future in zip(symbols, futures):
+                    try:
+                        series[symbol] = future.result()
+                        if self.debug:
+                            print(f"✅ {symbol} 历史K线获取成功: {len(series[symbol][1])} 条")
+                    except Exception as se:
+                        print(f"❌ 获取{symbol}历史K线失败: {se}")
+                        series[symbol] = empty
         except Exception as e:
             print(f"❌ 批量获取历史K线失败: {e}")
-            return {symbol: [] for symbol in symbols}
+            return {symbol: empty for symbol in symbols}
         
+        ok = sum(1 for _, closes in series.values() if closes.size > 0)
+        kind = "增量" if start_times else ""
+        print(f"✅ 历史K线{kind}获取成功 {ok}/{len(symbols)} 个交易对，耗时{(time.perf_counter() - started) * 1000:.0f}ms")
         return series
     
+    def _fetch_klines(self, symbol: str, interval: str, limit: int,
+                      start_time: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """拉取单个交易对的K线并返回(开盘时间, 收盘价)数组（供并发任务调用）"""
+        params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+        if start_time is not None:
+            params['startTime'] = int(start_time)
+        with _klines_slots:
+            if self._fast_json_enabled():
+                klines = self._public_get('klines', params)
+            else:
+                klines = self.client.get_klines(**params)
+        # kline结构: [open_time, open, high, low, close, volume, close_time, ...]
+        # 收盘价为字符串，由numpy在C层批量转换为float64
+        if not klines:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        open_times = np.array([k[0] for k in klines], dtype=np.int64)
+        closes = np.array([k[4] for k in klines], dtype=np.float64)
+        return open_times, closes
+    
+    def _fast_json_enabled(self) -> bool:
+        """orjson可用且SDK客户端暴露了session/API_URL时，公共行情接口走直连+orjson解析"""
+        if orjson is None:
+            return False
+        api_url = getattr(self.client, 'API_URL', None)
+        return getattr(self.client, 'session', None) is not None and isinstance(api_url, str) and '{' not in api_url
+    
+    def _public_get(self, path: str, params: Dict) -> object:
+        """复用SDK的HTTP会话请求公共行情接口（无需签名），用orjson解析响应体"""
+        url = f"{self.client.API_URL}/v3/{path}"
+        resp = self.client.session.get(url, params=params, timeout=self.http_timeout)
+        if resp.status_code >= 400:
+            raise BinanceAPIException(resp, resp.status_code, resp.text)
+        return orjson.loads(resp.content)
+    
     def _resync_time(self):
-        """与服务器时间重同步，更新client.timestamp_offset"""
+        """与服务器时间重同步，更新client.timestamp_offset（5秒内已同步过则直接复用）"""
         if self.client is None:
             return
+        with self._clock_lock:
+            if time.time() - self._clock_skew_ts < 5:
+                return
+            try:
+                server_time = self.client.get_server_time()
+                if isinstance(server_time, dict) and 'serverTime' in server_time:
+                    self.client.timestamp_offset = int(server_time['serverTime']) - int(time.time() * 1000)
+                    self._clock_skew_ts = time.time()
+                    print(f"🔄 重新同步时间偏移: {getattr(self.client, 'timestamp_offset', 0)} ms")
+            except Exception as e:
+                print(f"⚠️ 重同步时间失败: {e}")
+    
+    @staticmethod
+    def _is_timestamp_error(e: Exception) -> bool:
+        msg = str(e)
+        return getattr(e, 'code', None) == -1021 or 'ahead of the server' in msg or 'outside of the recvWindow' in msg
+    
+    @staticmethod
+    def _request_not_sent(e: Exception) -> bool:
+        """请求确定未送达交易所：连接超时，或建立连接阶段的连接错误（连接中途断开的ProtocolError除外）"""
+        if isinstance(e, requests.exceptions.ConnectTimeout):
+            return True
+        if not isinstance(e, requests.exceptions.ConnectionError):
+            return False
+        reason = e.args[0] if e.args else None
+        reason = getattr(reason, 'reason', reason)
+        return not isinstance(reason, urllib3.exceptions.ProtocolError)
+    
+    def _with_retry(self, op_name: str, fn, *args, live_order: bool = False, **kwargs):
+        """
+        执行币安请求：网络异常、5xx与时间戳错误(-1021)时按指数退避+抖动重试，其余异常直接抛出
+        真实下单传live_order=True：只重试请求确定未送达的错误（连接失败/连接超时）与-1021；
+        读超时、连接中途断开与5xx（币安语义为"执行状态未知"）时订单可能已成交，不再重试，
+        抛出OrderStatusUnknown由调用方按失败/状态未知处理，避免重复成交
+        
+        Raises:
+            RetryExhausted: 可重试的错误在BINANCE_RETRY_ATTEMPTS次尝试后仍未恢复
+            OrderStatusUnknown: live_order=True且请求可能已送达
+        """
+        last_error: Optional[Exception] = None
+        for attempt in range(self.retry_attempts):
+            try:
+                return fn(*args, **kwargs)
+            except BinanceAPIException as e:
+                if self._is_timestamp_error(e):
+                    print(f"⚠️ {op_name}时间戳/窗口错误({getattr(e, 'code', 'unknown')})，重同步时间后重试")
+                    self._resync_time()
+                elif (getattr(e, 'status_code', 0) or 0) >= 500:
+                    if live_order:
+                        raise OrderStatusUnknown(str(e)) from e
+                    print(f"⚠️ {op_name}服务端错误({e.status_code})，自动重试")
+                else:
+                    raise
+                last_error = e
+            except requests.exceptions.RequestException as e:
+                if live_order and not self._request_not_sent(e):
+                    raise OrderStatusUnknown(str(e)) from e
+                print(f"⚠️ {op_name}网络异常/请求超时，自动重试：{e}")
+                last_error = e
+            if attempt + 1 < self.retry_attempts:
+                time.sleep(min(2 ** attempt * 0.1 + random.random() * 0.05, 2.0))
+        raise RetryExhausted(str(last_error)) from last_error
+    
+    def _get_account_snapshot(self) -> Optional[Dict[str, Dict[str, float]]]:
+        """
+        获取账户余额快照（free/locked），在BINANCE_ACCOUNT_TTL内复用
+        
+        Returns:
+            快照字典，格式为{asset: {"free": x, "locked": y}}；失败返回None
+        """
+        cached = self._account_cache
+        if cached and time.time() - cached[0] < self.account_ttl:
+            return cached[1]
         try:
-            server_time = self.client.get_server_time()
-            if isinstance(server_time, dict) and 'serverTime' in server_time:
-                import time
-                self.client.timestamp_offset = int(server_time['serverTime']) - int(time.time() * 1000)
-                print(f"🔄 重新同步时间偏移: {getattr(self.client, 'timestamp_offset', 0)} ms")
+            account = self._with_retry('获取账户余额', self.client.get_account, recvWindow=self.recv_window)
+        except RetryExhausted:
+            print("❌ 获取账户余额失败: 重试次数耗尽")
+            return None
         except Exception as e:
-            print(f"⚠️ 重同步时间失败: {e}")
+            print(f"❌ 获取账户余额失败: {e}")
+            return None
+        snapshot: Dict[str, Dict[str, float]] = {}
+        for b in account.get('balances', []):
+            asset = b.get('asset')
+            try:
+                free_amt = float(b.get('free', 0) or 0)
+                locked_amt = float(b.get('locked', 0) or 0)
+                if asset and (free_amt > 0 or locked_amt > 0):
+                    snapshot[asset] = {"free": free_amt, "locked": locked_amt}
+            except Exception:
+                continue
+        self._account_cache = (time.time(), snapshot)
+        return snapshot
+    
+    def _invalidate_account_cache(self) -> None:
+        """真实成交后余额已变化，丢弃账户快照"""
+        self._account_cache = None
     
     def get_account_balances(self) -> Dict[str, float]:
         """
@@ -197,67 +534,148 @@ class ExchangeAPI:
         if self.client is None:
             print("❌ API客户端未初始化")
             return {}
-        # 通过recvWindow放宽时间窗口，降低-1021错误概率
-        import os as _os
-        try:
-            recv_window = int(_os.getenv('BINANCE_RECVWINDOW', '60000'))
-            if recv_window > 60000:
-                recv_window = 60000
-        except Exception:
-            recv_window = 60000
-        attempts = 0
-        while attempts < 2:
-            try:
-                account = self.client.get_account(recvWindow=recv_window)
-                balances: Dict[str, float] = {}
-                for b in account.get('balances', []):
-                    asset = b.get('asset')
-                    try:
-                        free_amt = float(b.get('free', 0) or 0)
-                        locked_amt = float(b.get('locked', 0) or 0)
-                        total = free_amt + locked_amt
-                        if asset and total > 0:
-                            balances[asset] = total
-                    except Exception:
-                        continue
-                return balances
-            except BinanceAPIException as e:
-                # 处理-1021错误：时间戳超前，重同步后重试
-                if getattr(e, 'code', None) == -1021 or 'ahead of the server' in str(e) or 'outside of the recvWindow' in str(e):
-                    print(f"⚠️ 时间戳错误({getattr(e, 'code', 'unknown')}), 尝试重同步时间后重试")
-                    self._resync_time()
-                    attempts += 1
-                    continue
-                else:
-                    print(f"❌ 获取账户余额失败: {e}")
-                    return {}
-            except Exception as e:
-                print(f"❌ 获取账户余额失败: {e}")
-                return {}
-        print("❌ 获取账户余额失败: 重试次数耗尽")
-        return {}
+        snapshot = self._get_account_snapshot()
+        if snapshot is None:
+            return {}
+        return {asset: d["free"] + d["locked"] for asset, d in snapshot.items()}
+    
+    def get_balance_snapshot(self) -> Tuple[Dict[str, float], Dict[str, float]]:
+        """
+        从同一账户快照同时取出总余额（free+locked）与可用余额（free），保证两者一致
+        
+        Returns:
+            (总余额字典, 可用余额字典)，均为{asset: amount}；失败返回两个空字典
+        """
+        if self.client is None:
+            print("❌ API客户端未初始化")
+            return {}, {}
+        snapshot = self._get_account_snapshot()
+        if snapshot is None:
+            return {}, {}
+        totals = {asset: d["free"] + d["locked"] for asset, d in snapshot.items()}
+        frees = {asset: d["free"] for asset, d in snapshot.items()}
+        return totals, frees
     
     def is_available(self) -> bool:
         """检查API是否可用"""
         return self.client is not None
 
+    def _cached_symbol_info(self, symbol: str) -> Optional[Dict]:
+        cached = self._symbol_info_cache.get(symbol)
+        if cached and time.time() - cached[0] < self.symbol_info_ttl:
+            return cached[1]
+        return None
+
+    def _symbol_info_missing(self, symbol: str) -> bool:
+        missed_at = _SYMBOL_INFO_MISSES.get(symbol)
+        return missed_at is not None and time.time() - missed_at < self.symbol_info_ttl
+
+    def _load_exchange_info(self) -> bool:
+        """
+        一次请求exchangeInfo，填充全部交易对信息缓存（代替逐个交易对请求）
+        
+        Returns:
+            TTL内已有完整的exchangeInfo时为True（此时缓存中没有的交易对即交易所不存在）
+        """
+        global _symbol_info_loaded_at
+        with _symbol_info_lock:
+            if time.time() - _symbol_info_loaded_at < self.symbol_info_ttl:
+                return True
+            try:
+                info = self.client.get_exchange_info() or {}
+                now = time.time()
+                quantizers: Dict[str, Tuple[int, Decimal]] = {}
+                for item in info.get('symbols', []):
+                    sym = item.get('symbol')
+                    if sym:
+                        self._symbol_info_cache[sym] = (now, item)
+                        quantizers[sym] = self._make_quantizer(item)
+                self._quantizer_cache.update(quantizers)
+                _symbol_info_loaded_at = now
+                return True
+            except Exception as e:
+                print(f"⚠️ 批量获取交易对信息失败: {e}")
+                return False
+
     def get_symbol_info(self, symbol: str) -> Dict:
-        """获取交易对信息（过滤器、精度等）"""
+        """
+        获取交易对信息（过滤器、精度等）
+        依次查找进程内缓存（BINANCE_SYMBOL_INFO_TTL）、磁盘缓存（BINANCE_SYMBOL_INFO_DISK_TTL，默认24小时）、
+        批量exchangeInfo，仅在exchangeInfo拉取失败时单独请求；从交易所取得的结果写入磁盘缓存，
+        交易所不存在的交易对在BINANCE_SYMBOL_INFO_TTL内直接返回空字典
+        """
         if self.client is None:
             return {}
+        info = self._cached_symbol_info(symbol)
+        if info is not None:
+            return info
+        if self._symbol_info_missing(symbol):
+            return {}
+        info = _read_symbol_info_file(symbol)
+        if info is not None:
+            self._symbol_info_cache[symbol] = (time.time(), info)
+            return info
+        loaded = self._load_exchange_info()
+        info = self._cached_symbol_info(symbol)
+        if info is not None:
+            _write_symbol_info_file(symbol, info)
+            return info
+        if loaded:
+            _SYMBOL_INFO_MISSES[symbol] = time.time()
+            return {}
         try:
-            return self.client.get_symbol_info(symbol)
+            info = self.client.get_symbol_info(symbol)
+            if info:
+                self._symbol_info_cache[symbol] = (time.time(), info)
+                _write_symbol_info_file(symbol, info)
+            else:
+                _SYMBOL_INFO_MISSES[symbol] = time.time()
+            return info or {}
         except Exception as e:
             print(f"⚠️ 获取交易对信息失败: {e}")
             return {}
     
+    @staticmethod
+    def _make_quantizer(info: Dict) -> Tuple[int, Decimal]:
+        """按交易对的 quotePrecision/quoteAssetPrecision 构造量化器（缺省精度2）"""
+        try:
+            precision = int(info.get('quotePrecision', info.get('quoteAssetPrecision', 2)) or 2)
+        except Exception:
+            precision = 2
+        return precision, Decimal(1).scaleb(-precision)
+
+    def _quantize_quote(self, symbol: str, raw_amount: float) -> Tuple[float, int]:
+        """将USDT金额按交易对精度向下取整，返回(量化后金额, 精度)"""
+        cached = self._quantizer_cache.get(symbol)
+        if cached is None:
+            info = {}
+            try:
+                info = self.get_symbol_info(symbol) or {}
+            except Exception:
+                pass
+            cached = self._make_quantizer(info)
+            if info:
+                self._quantizer_cache[symbol] = cached
+        precision, quantizer = cached
+        # repr给出float的最短精确表示；小数位数已不超过精度时无需量化
+        text = repr(raw_amount)
+        if 'e' not in text and 'n' not in text and len(text.partition('.')[2]) <= precision:
+            return raw_amount, precision
+        try:
+            return float(Decimal(text).quantize(quantizer, rounding=ROUND_DOWN)), precision
+        except Exception:
+            return float(f"{raw_amount:.{precision}f}"), precision
+    
     def get_asset_balance(self, asset: str) -> float:
-        """获取指定资产余额（free+locked）"""
+        """获取指定资产余额（free+locked），直接读取账户快照"""
         if self.client is None:
             return 0.0
         try:
-            account = self.get_account_balances()
-            return float(account.get(asset, 0.0))
+            snapshot = self._get_account_snapshot()
+            d = (snapshot or {}).get(asset)
+            if not d:
+                return 0.0
+            return float(d["free"] + d["locked"])
         except Exception:
             return 0.0
 
@@ -265,20 +683,28 @@ class ExchangeAPI:
         """获取指定资产余额明细：free、locked与total（free+locked）。"""
         if self.client is None:
             return {"free": 0.0, "locked": 0.0, "total": 0.0}
-        try:
-            bal = self.client.get_asset_balance(asset=asset)
-            try:
-                free = float(bal.get('free', 0) or 0)
-            except Exception:
-                free = 0.0
-            try:
-                locked = float(bal.get('locked', 0) or 0)
-            except Exception:
-                locked = 0.0
-            return {"free": free, "locked": locked, "total": free + locked}
-        except Exception as e:
-            print(f"⚠️ 获取资产余额明细失败({asset}): {e}")
+        snapshot = self._get_account_snapshot()
+        if snapshot is None:
+            print(f"⚠️ 获取资产余额明细失败({asset})")
             return {"free": 0.0, "locked": 0.0, "total": 0.0}
+        d = snapshot.get(asset) or {}
+        free = float(d.get("free", 0.0))
+        locked = float(d.get("locked", 0.0))
+        return {"free": free, "locked": locked, "total": free + locked}
+
+    def get_all_free_balances(self) -> Dict[str, float]:
+        """
+        获取全部资产的可用余额（free），一次账户请求返回所有资产，与get_account_balances共用快照
+        
+        Returns:
+            可用余额字典，格式为{asset: free}；仅包含有余额的资产，失败返回空字典
+        """
+        if self.client is None:
+            return {}
+        snapshot = self._get_account_snapshot()
+        if snapshot is None:
+            return {}
+        return {asset: d["free"] for asset, d in snapshot.items()}
 
     def get_asset_free_balance(self, asset: str) -> float:
         """获取指定资产的可用余额（free）。"""
@@ -292,129 +718,130 @@ class ExchangeAPI:
         """下达市场买单，按USDT金额（quoteOrderQty）下单。test=True使用测试单。"""
         if self.client is None:
             return {"ok": False, "error": "client_not_initialized"}
-        # 配置超时与重试
-        import os as _os
         try:
-            recv_window = int(_os.getenv('BINANCE_RECVWINDOW', '60000'))
-            if recv_window > 60000:
-                recv_window = 60000
-        except Exception:
-            recv_window = 60000
+            # 处理 quoteOrderQty 精度：根据交易对的 quotePrecision/quoteAssetPrecision 做量化，避免 -1111
+            raw_amount = float(usdt_amount)
+            rounded_amount, precision = self._quantize_quote(symbol, raw_amount)
+        except Exception as e:
+            print(f"❌ 下单失败: {e}")
+            return {"ok": False, "error": str(e)}
+        if rounded_amount <= 0:
+            return {"ok": False, "error": "quoteOrderQty_non_positive_after_rounding"}
+        params = {
+            'symbol': symbol,
+            'side': BinanceClient.SIDE_BUY,
+            'type': BinanceClient.ORDER_TYPE_MARKET,
+            'quoteOrderQty': float(rounded_amount),
+            'recvWindow': self.recv_window,
+            'newOrderRespType': 'RESULT',
+        }
+        if abs(rounded_amount - raw_amount) > 1e-12:
+            print(f"ℹ️ 订单金额精度调整: 原始={raw_amount:.10f} -> 下单={rounded_amount:.{precision}f} (精度={precision})")
+        print(f"⏳ 正在提交市价买单：{symbol} 金额={float(rounded_amount)} USDT, test={test}")
         try:
-            max_attempts = int(_os.getenv('BINANCE_RETRY_ATTEMPTS', '2'))
-        except Exception:
-            max_attempts = 2
-        attempts = 0
-        while attempts < max_attempts:
-            try:
-                # 处理 quoteOrderQty 精度：根据交易对的 quotePrecision/quoteAssetPrecision 做量化，避免 -1111
-                from decimal import Decimal, ROUND_DOWN
-                raw_amount = float(usdt_amount)
-                precision = 2
-                try:
-                    info = self.get_symbol_info(symbol) or {}
-                    precision = int(info.get('quotePrecision', info.get('quoteAssetPrecision', 2)) or 2)
-                except Exception:
-                    precision = 2
-                try:
-                    quant = Decimal(str(raw_amount)).quantize(Decimal('1').scaleb(-precision), rounding=ROUND_DOWN)
-                    rounded_amount = float(quant)
-                except Exception:
-                    rounded_amount = float(f"{raw_amount:.{precision}f}")
-                if rounded_amount <= 0:
-                    return {"ok": False, "error": "quoteOrderQty_non_positive_after_rounding"}
-                params = {
-                    'symbol': symbol,
-                    'side': BinanceClient.SIDE_BUY,
-                    'type': BinanceClient.ORDER_TYPE_MARKET,
-                    'quoteOrderQty': float(rounded_amount),
-                    'recvWindow': recv_window,
-                    'newOrderRespType': 'RESULT',
-                }
-                if abs(rounded_amount - raw_amount) > 1e-12:
-                    print(f"ℹ️ 订单金额精度调整: 原始={raw_amount:.10f} -> 下单={rounded_amount:.{precision}f} (精度={precision})")
-                print(f"⏳ 正在提交市价买单(第{attempts+1}/{max_attempts}次)：{symbol} 金额={float(rounded_amount)} USDT, test={test}")
-                if test:
-                    self.client.create_test_order(**params)
-                    print(f"✅ 市价买单测试提交成功：{symbol} 金额={float(rounded_amount)} USDT")
-                    return {"ok": True, "type": "test", "symbol": symbol, "side": "BUY", "quoteOrderQty": float(usdt_amount)}
-                else:
-                    order = self.client.create_order(**params)
-                    print(f"✅ 市价买单提交成功：{symbol} 金额={float(rounded_amount)} USDT")
-                    return {"ok": True, "type": "live", "order": order}
-            except BinanceAPIException as e:
-                code = getattr(e, 'code', None)
-                msg = str(e)
-                # 时间戳与窗口错误，尝试重同步时间后重试
-                if code == -1021 or 'ahead of the server' in msg or 'outside of the recvWindow' in msg:
-                    print(f"⚠️ 时间戳/窗口错误({code})，尝试重同步时间后重试")
-                    self._resync_time()
-                    attempts += 1
-                    continue
-                print(f"❌ 下单失败(BinanceAPIException): {e}")
-                return {"ok": False, "error": str(e), "code": code}
-            except requests.exceptions.RequestException as e:
-                print(f"⚠️ 网络异常/请求超时，自动重试：{e}")
-                attempts += 1
-                continue
-            except Exception as e:
-                print(f"❌ 下单失败: {e}")
-                return {"ok": False, "error": str(e)}
-        print("❌ 下单失败：重试次数耗尽")
-        return {"ok": False, "error": "retry_exhausted"}
+            if test:
+                self._with_retry('市价买单', self.client.create_test_order, **params)
+                print(f"✅ 市价买单测试提交成功：{symbol} 金额={float(rounded_amount)} USDT")
+                return {"ok": True, "type": "test", "symbol": symbol, "side": "BUY", "quoteOrderQty": float(usdt_amount)}
+            order = self._with_retry('市价买单', self.client.create_order, live_order=True, **params)
+            self._invalidate_account_cache()
+            print(f"✅ 市价买单提交成功：{symbol} 金额={float(rounded_amount)} USDT")
+            return {"ok": True, "type": "live", "order": order}
+        except RetryExhausted:
+            print("❌ 下单失败：重试次数耗尽")
+            return {"ok": False, "error": "retry_exhausted"}
+        except OrderStatusUnknown as e:
+            # 订单可能已成交，余额快照作废；交由人工/下一轮按账户余额核对
+            self._invalidate_account_cache()
+            print(f"❌ 下单状态未知（可能已成交，未重试）：{symbol} {e}")
+            return {"ok": False, "error": "status_unknown", "detail": str(e)}
+        except BinanceAPIException as e:
+            print(f"❌ 下单失败(BinanceAPIException): {e}")
+            return {"ok": False, "error": str(e), "code": getattr(e, 'code', None)}
+        except Exception as e:
+            print(f"❌ 下单失败: {e}")
+            return {"ok": False, "error": str(e)}
 
     def place_market_sell_qty(self, symbol: str, quantity: float, test: bool = True) -> Dict:
         """下达市场卖单，按数量（base asset）下单。test=True使用测试单。"""
         if self.client is None:
             return {"ok": False, "error": "client_not_initialized"}
-        # 配置超时与重试
-        import os as _os
+        params = {
+            'symbol': symbol,
+            'side': BinanceClient.SIDE_SELL,
+            'type': BinanceClient.ORDER_TYPE_MARKET,
+            'quantity': float(quantity),
+            'recvWindow': self.recv_window,
+            'newOrderRespType': 'RESULT',
+        }
+        print(f"⏳ 正在提交市价卖单：{symbol} 数量={float(quantity)}, test={test}")
         try:
-            recv_window = int(_os.getenv('BINANCE_RECVWINDOW', '60000'))
-            if recv_window > 60000:
-                recv_window = 60000
-        except Exception:
-            recv_window = 60000
+            if test:
+                self._with_retry('市价卖单', self.client.create_test_order, **params)
+                print(f"✅ 市价卖单测试提交成功：{symbol} 数量={float(quantity)}")
+                return {"ok": True, "type": "test", "symbol": symbol, "side": "SELL", "quantity": float(quantity)}
+            order = self._with_retry('市价卖单', self.client.create_order, live_order=True, **params)
+            self._invalidate_account_cache()
+            print(f"✅ 市价卖单提交成功：{symbol} 数量={float(quantity)}")
+            return {"ok": True, "type": "live", "order": order}
+        except RetryExhausted:
+            print("❌ 下单失败：重试次数耗尽")
+            return {"ok": False, "error": "retry_exhausted"}
+        except OrderStatusUnknown as e:
+            # 订单可能已成交，余额快照作废；交由人工/下一轮按账户余额核对
+            self._invalidate_account_cache()
+            print(f"❌ 下单状态未知（可能已成交，未重试）：{symbol} {e}")
+            return {"ok": False, "error": "status_unknown", "detail": str(e)}
+        except BinanceAPIException as e:
+            print(f"❌ 下单失败(BinanceAPIException): {e}")
+            return {"ok": False, "error": str(e), "code": getattr(e, 'code', None)}
+        except Exception as e:
+            print(f"❌ 下单失败: {e}")
+            return {"ok": False, "error": str(e)}
+
+    @staticmethod
+    def _order_result(future: Future) -> Dict:
+        """取出并发下单结果，异常统一转换为失败结果"""
         try:
-            max_attempts = int(_os.getenv('BINANCE_RETRY_ATTEMPTS', '2'))
-        except Exception:
-            max_attempts = 2
-        attempts = 0
-        while attempts < max_attempts:
-            try:
-                params = {
-                    'symbol': symbol,
-                    'side': BinanceClient.SIDE_SELL,
-                    'type': BinanceClient.ORDER_TYPE_MARKET,
-                    'quantity': float(quantity),
-                    'recvWindow': recv_window,
-                    'newOrderRespType': 'RESULT',
-                }
-                print(f"⏳ 正在提交市价卖单(第{attempts+1}/{max_attempts}次)：{symbol} 数量={float(quantity)}, test={test}")
-                if test:
-                    self.client.create_test_order(**params)
-                    print(f"✅ 市价卖单测试提交成功：{symbol} 数量={float(quantity)}")
-                    return {"ok": True, "type": "test", "symbol": symbol, "side": "SELL", "quantity": float(quantity)}
-                else:
-                    order = self.client.create_order(**params)
-                    print(f"✅ 市价卖单提交成功：{symbol} 数量={float(quantity)}")
-                    return {"ok": True, "type": "live", "order": order}
-            except BinanceAPIException as e:
-                code = getattr(e, 'code', None)
-                msg = str(e)
-                if code == -1021 or 'ahead of the server' in msg or 'outside of the recvWindow' in msg:
-                    print(f"⚠️ 时间戳/窗口错误({code})，尝试重同步时间后重试")
-                    self._resync_time()
-                    attempts += 1
-                    continue
-                print(f"❌ 下单失败(BinanceAPIException): {e}")
-                return {"ok": False, "error": str(e), "code": code}
-            except requests.exceptions.RequestException as e:
-                print(f"⚠️ 网络异常/请求超时，自动重试：{e}")
-                attempts += 1
-                continue
-            except Exception as e:
-                print(f"❌ 下单失败: {e}")
-                return {"ok": False, "error": str(e)}
-        print("❌ 下单失败：重试次数耗尽")
-        return {"ok": False, "error": "retry_exhausted"}
+            return future.result()
+        except Exception as e:
+            print(f"❌ 下单失败: {e}")
+            return {"ok": False, "error": str(e)}
+
+    def place_market_buys(self, orders: List[Dict], test: bool = True) -> List[Dict]:
+        """
+        批量下达市场买单（并发提交）
+        
+        Args:
+            orders: 买单列表，格式为[{"symbol": ..., "quote_usdt": ...}]
+            test: 是否使用测试单
+        Returns:
+            下单结果列表，与输入顺序一致
+        """
+        if not orders:
+            return []
+        with ThreadPoolExecutor(max_workers=min(len(orders), self.order_concurrency), thread_name_prefix='binance-order') as pool:
+            futures = [
+                pool.submit(self.place_market_buy_usdt, o.get('symbol'), float(o.get('quote_usdt') or 0.0), test)
+                for o in orders
+            ]
+            return [self._order_result(f) for f in futures]
+
+    def place_market_sells(self, orders: List[Dict], test: bool = True) -> List[Dict]:
+        """
+        批量下达市场卖单（并发提交）
+        
+        Args:
+            orders: 卖单列表，格式为[{"symbol": ..., "quantity": ...}]
+            test: 是否使用测试单
+        Returns:
+            下单结果列表，与输入顺序一致
+        """
+        if not orders:
+            return []
+        with ThreadPoolExecutor(max_workers=min(len(orders), self.order_concurrency), thread_name_prefix='binance-order') as pool:
+            futures = [
+                pool.submit(self.place_market_sell_qty, o.get('symbol'), float(o.get('quantity') or 0.0), test)
+                for o in orders
+            ]
+            return [self._order_result(f) for f in futures]
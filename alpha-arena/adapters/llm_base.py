@@ -5,13 +5,135 @@ LLM适配器基类
 定义统一的LLM接口规范
 """
 
+import os
+import sys
+import json
+import asyncio
+import hashlib
+import threading
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple
+from .llm_cache import RESPONSE_CACHE, cache_allowed, get_disk_cache, make_cache_key
+from .semantic_cache import (SEMANTIC_CACHE, extract_price_vector, mask_prices,
+                             max_relative_change, semantic_cache_enabled)
+
+
+# 固定的兜底/短路响应（intern后全局唯一，错误路径不再构造新字符串）
+HOLD_API_FAIL = sys.intern('{"symbol": null, "action": "HOLD", "confidence": 0.0, "rationale": "API调用失败"}')
+HOLD_STRUCT_ERR = sys.intern('{"symbol": null, "action": "HOLD", "confidence": 0.0, "rationale": "Qwen返回结构缺少choices"}')
+# 行情无实质变化时直接返回的观望决策
+HOLD_NO_CHANGE = sys.intern('{"symbol": null, "action": "HOLD", "confidence": 0.0, "rationale": "no_material_change"}')
+# 预解析结果，决策层命中时无需再json.loads（使用方需复制后再修改）
+CANNED_RESPONSES: Dict[str, Dict[str, Any]] = {
+    s: json.loads(s) for s in (HOLD_API_FAIL, HOLD_STRUCT_ERR, HOLD_NO_CHANGE)
+}
+
+# 各模型上一次真实调用的输入 {model: (提示词骨架, 价格向量)}；适配器每轮重建，故放在模块级
+_last_inputs: Dict[str, Tuple[str, Dict[str, float]]] = {}
+_last_inputs_lock = threading.Lock()
+
+
+@lru_cache(maxsize=16)
+def _text_digest(text: str) -> str:
+    """系统提示词固定不变，其摘要只需计算一次（str自带哈希缓存，查表开销极小）"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _hold_eps() -> float:
+    """LLM_HOLD_EPS>0 时启用无变化短路（如0.001即价格最大变动<0.1%）"""
+    try:
+        return float(os.getenv('LLM_HOLD_EPS', '0'))
+    except Exception:
+        return 0.0
+
+
+def prompt_cache_key() -> Optional[str]:
+    """服务端前缀缓存的路由提示（LLM_PROMPT_CACHE_KEY，默认不发送）"""
+    return os.getenv('LLM_PROMPT_CACHE_KEY', '').strip() or None
+
+
+def _usage_value(usage: Any, *names: str) -> Optional[int]:
+    """兼容对象属性与dict两种usage结构，返回第一个存在的字段（支持a.b路径）"""
+    for name in names:
+        node = usage
+        for part in name.split('.'):
+            if node is None:
+                break
+            node = node.get(part) if isinstance(node, dict) else getattr(node, part, None)
+        if node is not None:
+            try:
+                return int(node)
+            except Exception:
+                continue
+    return None
+
+
+def stream_enabled() -> bool:
+    """流式调用开关（LLM_STREAM=0 关闭，改回一次性返回）"""
+    return os.getenv('LLM_STREAM', '1').strip() != '0'
+
+
+def usage_log_enabled() -> bool:
+    """token用量/前缀缓存命中日志开关（LLM_LOG_USAGE=1 开启）"""
+    return os.getenv('LLM_LOG_USAGE', '0').strip() == '1'
+
+
+class JsonObjectScanner:
+    """增量扫描流式输出，第一个顶层JSON对象的右括号到达时即判定完成（忽略字符串内的括号）"""
+    
+    def __init__(self):
+        self.parts = []
+        self._pos = 0
+        self._start = -1
+        self._end = -1
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+    
+    def feed(self, piece: str) -> bool:
+        """追加一段输出，顶层对象已完整时返回True"""
+        self.parts.append(piece)
+        for ch in piece:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = self._depth > 0
+            elif ch == '{':
+                if self._depth == 0:
+                    self._start = self._pos
+                self._depth += 1
+            elif ch == '}' and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._end = self._pos
+                    return True
+            self._pos += 1
+        return False
+    
+    def result(self) -> str:
+        """完整时返回JSON对象文本，否则返回已收到的全部输出"""
+        text = ''.join(self.parts)
+        if self._end >= 0:
+            return text[self._start:self._end + 1]
+        return text.strip()
 
 
 class LLMAdapter(ABC):
     """LLM适配器基类"""
     
+    # 请求参数（由子类覆盖），同时参与缓存键的构造
+    model: str = ""
+    system_prompt: str = ""
+    temperature: float = 0.0
+    top_p: float = 1.0
+    max_tokens: int = 400
+    
     def __init__(self, api_key: str):
         """
         初始化LLM适配器
@@ -34,6 +156,19 @@ class LLMAdapter(ABC):
         """
         pass
     
+    async def acall(self, prompt: str) -> str:
+        """
+        异步调用LLM API（默认在线程池中执行同步call，子类可覆盖为原生异步实现）
+        
+        Args:
+            prompt: 输入提示词
+            
+        Returns:
+            LLM响应文本
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.call, prompt)
+    
     @abstractmethod
     def get_model_name(self) -> str:
         """
@@ -43,3 +178,93 @@ class LLMAdapter(ABC):
             模型名称
         """
         pass
+    
+    def _log_usage(self, usage: Any) -> None:
+        """LLM_LOG_USAGE=1 时打印输入token数与服务端前缀缓存命中的token数"""
+        if usage is None or not usage_log_enabled():
+            return
+        prompt_tokens = _usage_value(usage, 'prompt_tokens', 'input_tokens')
+        # DeepSeek: prompt_cache_hit_tokens；Qwen/OpenAI兼容: prompt_tokens_details.cached_tokens
+        cached_tokens = _usage_value(usage, 'prompt_cache_hit_tokens', 'prompt_tokens_details.cached_tokens')
+        print(f"📊 {self.get_model_name()} 输入token={prompt_tokens if prompt_tokens is not None else 'N/A'}，"
+              f"前缀缓存命中={cached_tokens if cached_tokens is not None else 'N/A'}")
+    
+    def _cache_key(self, prompt: str) -> str:
+        """按 模型|系统提示|用户提示|采样参数 生成缓存键"""
+        return make_cache_key(
+            model=self.model,
+            system=_text_digest(self.system_prompt),
+            prompt=prompt,
+            temperature=self.temperature,
+            top_p=self.top_p,
+            max_tokens=self.max_tokens,
+        )
+    
+    def _cache_lookup(self, prompt: str) -> Optional[str]:
+        """查询响应缓存（内存 -> 磁盘 -> 按需查语义缓存 -> 无变化短路），未命中返回None"""
+        if cache_allowed(self.temperature):
+            key = self._cache_key(prompt)
+            cached = RESPONSE_CACHE.get(key)
+            if cached is None:
+                disk = get_disk_cache()
+                cached = disk.get(key) if disk is not None else None
+                if cached is not None:
+                    RESPONSE_CACHE.put(key, cached)
+            if cached is not None:
+                return cached
+        if semantic_cache_enabled():
+            cached = SEMANTIC_CACHE.lookup(self.model, prompt)
+            if cached is not None:
+                return cached
+        return self._stale_hold(prompt)
+    
+    async def _acache_lookup(self, prompt: str) -> Optional[str]:
+        """_cache_lookup的异步版本：磁盘缓存/语义模型等阻塞操作放到线程池，避免阻塞事件循环导致超时失效"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._cache_lookup, prompt)
+    
+    def _stale_hold(self, prompt: str) -> Optional[str]:
+        """与上一次真实调用相比，提示词骨架不变且价格最大相对变动低于LLM_HOLD_EPS时返回HOLD，跳过API调用"""
+        eps = _hold_eps()
+        if eps <= 0:
+            return None
+        with _last_inputs_lock:
+            last = _last_inputs.get(self.model)
+        if last is None:
+            return None
+        prices = extract_price_vector(prompt)
+        if not prices or mask_prices(prompt) != last[0]:
+            return None
+        change = max_relative_change(last[1], prices)
+        if change is None or change >= eps:
+            return None
+        print(f"ℹ️ {self.get_model_name()} 行情无实质变化(最大变动{change:.4%})，跳过LLM调用")
+        return HOLD_NO_CHANGE
+    
+    def _cache_store(self, prompt: str, content: str) -> None:
+        """缓存成功返回的响应（失败兜底的HOLD不缓存），内存与磁盘同时写入，并记录本次输入供无变化短路比较"""
+        if not content:
+            return
+        if _hold_eps() > 0:
+            with _last_inputs_lock:
+                _last_inputs[self.model] = (mask_prices(prompt), extract_price_vector(prompt))
+        if cache_allowed(self.temperature):
+            key = self._cache_key(prompt)
+            RESPONSE_CACHE.put(key, content)
+            disk = get_disk_cache()
+            if disk is not None:
+                try:
+                    disk.put(key, content)
+                except Exception as e:
+                    print(f"⚠️ LLM持久化缓存写入失败: {e}")
+        if semantic_cache_enabled():
+            SEMANTIC_CACHE.add(self.model, prompt, content)
+    
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """获取各级缓存的命中统计"""
+        disk = get_disk_cache()
+        return {
+            "exact": RESPONSE_CACHE.stats(),
+            "disk": disk.stats() if disk is not None else {},
+            "semantic": SEMANTIC_CACHE.stats(),
+        }
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM响应缓存
+对相同模型、系统提示、用户提示与采样参数的请求复用已返回的响应，避免重复的网络与token开销。
+两级结构：进程内TTL+LRU缓存 + SQLite持久化缓存（跨进程/跨运行复用）。
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+def make_cache_key(**fields: Any) -> str:
+    """将请求字段序列化后计算sha256，作为缓存键"""
+    payload = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """进程内TTL+LRU缓存（线程安全），并统计命中/未命中次数"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        """
+        初始化缓存
+
+        Args:
+            maxsize: 最大条目数，超出后淘汰最久未使用的条目
+            ttl: 条目有效期（秒）
+        """
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = float(ttl)
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，过期或不存在时返回None"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: str) -> None:
+        """写入缓存，并按LRU淘汰超出容量的条目"""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """清空缓存与计数"""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """返回命中/未命中次数与当前条目数"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+# 进程级共享缓存：所有适配器共用，键中包含模型名，互不干扰
+RESPONSE_CACHE = ResponseCache(
+    maxsize=_env_int('LLM_CACHE_SIZE', 1024),
+    ttl=_env_int('LLM_CACHE_TTL', 3600),
+)
+
+
+def cache_allowed(temperature: float) -> bool:
+    """仅缓存确定性请求（temperature<=0）；设置LLM_CACHE_FORCE=1时强制缓存"""
+    if os.getenv('LLM_CACHE_FORCE', '0').strip() == '1':
+        return True
+    try:
+        return float(temperature) <= 0.0
+    except Exception:
+        return False
+
+
+class DiskCache:
+    """基于SQLite的持久化缓存（线程安全，跨进程共享），按TTL过期、按总字节数淘汰最久未访问条目"""
+
+    def __init__(self, directory: str, size_limit: int = 536870912, ttl: float = 3600):
+        """
+        初始化持久化缓存
+
+        Args:
+            directory: 缓存目录
+            size_limit: 缓存内容总字节数上限
+            ttl: 条目有效期（秒）
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.size_limit = int(size_limit)
+        self.ttl = float(ttl)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, 'cache.db'), timeout=5,
+                                     check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, '
+            'expire_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)')
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，过期或不存在时返回None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute('SELECT value, expire_at FROM cache WHERE key = ?', (key,)).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self._conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE cache SET accessed_at = ? WHERE key = ?', (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """写入缓存（ttl缺省使用实例TTL），清理过期条目并按字节上限淘汰"""
+        now = time.time()
+        size = len(value.encode('utf-8'))
+        expire_at = now + (self.ttl if ttl is None else float(ttl))
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO cache (key, value, size, expire_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                (key, value, size, expire_at, now),
+            )
+            self._conn.execute('DELETE FROM cache WHERE expire_at <= ?', (now,))
+            total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache').fetchone()[0]
+            while total > self.size_limit:
+                self._conn.execute(
+                    'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT 16)'
+                )
+                total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache').fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        """返回命中/未命中次数与当前条目数"""
+        with self._lock:
+            size = self._conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "size": size}
+
+
+_disk_cache: Optional[DiskCache] = None
+_disk_cache_failed = False
+_disk_cache_lock = threading.Lock()
+
+
+def get_disk_cache() -> Optional[DiskCache]:
+    """获取进程级持久化缓存（LLM_DISK_CACHE=0 关闭；初始化失败时返回None，不影响主流程）"""
+    global _disk_cache, _disk_cache_failed
+    if os.getenv('LLM_DISK_CACHE', '1').strip() != '1':
+        return None
+    if _disk_cache is not None or _disk_cache_failed:
+        return _disk_cache
+    with _disk_cache_lock:
+        if _disk_cache is None and not _disk_cache_failed:
+            directory = os.getenv('LLM_CACHE_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), '.llm_cache'))
+            try:
+                _disk_cache = DiskCache(
+                    directory,
+                    size_limit=_env_int('LLM_CACHE_BYTES', 536870912),
+                    ttl=_env_int('LLM_CACHE_TTL', 3600),
+                )
+            except Exception as e:
+                print(f"⚠️ LLM持久化缓存初始化失败: {e}")
+                _disk_cache_failed = True
+    return _disk_cache
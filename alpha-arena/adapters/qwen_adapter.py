@@ -6,8 +6,9 @@ Qwen适配器
 """
 
 import os
-from typing import Dict, Any
-from .llm_base import LLMAdapter
+import sys
+from typing import Dict, Any, Optional
+from .llm_base import HOLD_API_FAIL, HOLD_STRUCT_ERR, JsonObjectScanner, LLMAdapter, stream_enabled
 
 try:
     import dashscope
@@ -16,6 +17,20 @@ except ImportError:
     dashscope = None
 
 
+# 系统提示词（模块级常量，同时参与响应缓存键的构造）
+SYSTEM_PROMPT = sys.intern(
+    "你是专业的量化交易分析师。严格遵守以下规则：\n"
+    "1) 仅输出JSON，无任何额外文字或代码块。\n"
+    "2) 若置信度不足或无法满足交易所最小名义额/最小数量，必须返回HOLD或空方案。\n"
+    "3) 禁止同时对同一symbol买卖；禁止输出未在用户提示列出的交易对。\n"
+    "4) 理由需与输入数据直接相关，避免空话与套话。\n"
+    "优先输出组合方案：{\"buys\": [ { \"symbol\": \"<BASE>USDT\", \"quote_usdt\": <number> } , ... ], \"sells\": [ { \"symbol\": \"<BASE>USDT\", \"quantity\": <number> } , ... ], \"rationale\": \"<简要理由>\", \"confidence\": <0.0-1.0>}；若无法生成组合方案，退回旧格式 {\"symbol\": \"<BASE>USDT|null\", \"action\": \"BUY|SELL|HOLD\", \"confidence\": 0.0-1.0, \"rationale\": \"简短理由\" }"
+)
+
+# 预构建的system消息（只读，所有请求共用），每次调用只需构造user消息
+_SYSTEM_MSG = {"role": "system", "content": SYSTEM_PROMPT}
+
+
 class QwenAdapter(LLMAdapter):
     """Qwen适配器"""
     def __init__(self, api_key: str = None):
@@ -33,6 +48,10 @@ class QwenAdapter(LLMAdapter):
         
         super().__init__(api_key)
         
+        self.model = 'qwen-max'
+        self.system_prompt = SYSTEM_PROMPT
+        self.max_tokens = 400
+        
         # 初始化Qwen客户端
         if dashscope:
             dashscope.api_key = self.api_key
@@ -49,44 +68,121 @@ class QwenAdapter(LLMAdapter):
         except Exception:
             self.top_p = 0.9
     
+    def _request_kwargs(self, prompt: str) -> Dict[str, Any]:
+        """构造Generation请求参数（同步与异步调用共用）"""
+        return {
+            "model": self.model,
+            "messages": [_SYSTEM_MSG, {"role": "user", "content": prompt}],
+            "result_format": "message",
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "max_tokens": self.max_tokens,
+        }
+    
+    def _handle_response(self, prompt: str, response: Any) -> str:
+        # 统一按 message 返回解析，避免 output_text 属性异常
+        if getattr(response, 'status_code', None) == 200:
+            output = getattr(response, 'output', None)
+            choices = getattr(output, 'choices', None)
+            if choices and len(choices) > 0 and hasattr(choices[0], 'message') and hasattr(choices[0].message, 'content'):
+                content = choices[0].message.content.strip()
+                self._log_usage(getattr(response, 'usage', None))
+                self._cache_store(prompt, content)
+                return content
+            else:
+                return HOLD_STRUCT_ERR
+        else:
+            print(f"❌ Qwen API调用失败: {getattr(response, 'code', 'unknown')} - {getattr(response, 'message', 'unknown')}")
+            return HOLD_API_FAIL
+    
+    @staticmethod
+    def _stream_piece(chunk: Any) -> Optional[str]:
+        """取出增量输出片段；非200状态视为流式失败"""
+        if getattr(chunk, 'status_code', None) != 200:
+            raise RuntimeError(f"{getattr(chunk, 'code', 'unknown')} - {getattr(chunk, 'message', 'unknown')}")
+        choices = getattr(getattr(chunk, 'output', None), 'choices', None)
+        if choices and hasattr(choices[0], 'message'):
+            return getattr(choices[0].message, 'content', None)
+        return None
+    
+    def _call_stream(self, prompt: str) -> Optional[str]:
+        """流式调用（incremental_output），顶层JSON对象一完整即停止读取"""
+        responses = dashscope.Generation.call(stream=True, incremental_output=True, **self._request_kwargs(prompt))
+        scanner = JsonObjectScanner()
+        usage = None
+        try:
+            for chunk in responses:
+                piece = self._stream_piece(chunk)
+                usage = getattr(chunk, 'usage', None) or usage
+                if piece and scanner.feed(piece):
+                    break
+        finally:
+            close = getattr(responses, 'close', None)
+            if close is not None:
+                close()
+        self._log_usage(usage)
+        return scanner.result() or None
+    
+    async def _acall_stream(self, aio_generation: Any, prompt: str) -> Optional[str]:
+        """异步流式调用，逻辑同_call_stream"""
+        responses = await aio_generation.call(stream=True, incremental_output=True, **self._request_kwargs(prompt))
+        scanner = JsonObjectScanner()
+        usage = None
+        try:
+            async for chunk in responses:
+                piece = self._stream_piece(chunk)
+                usage = getattr(chunk, 'usage', None) or usage
+                if piece and scanner.feed(piece):
+                    break
+        finally:
+            aclose = getattr(responses, 'aclose', None)
+            if aclose is not None:
+                await aclose()
+        self._log_usage(usage)
+        return scanner.result() or None
+    
     def call(self, prompt: str) -> str:
-        """调用Qwen API"""
+        """调用Qwen API（相同请求优先命中响应缓存；默认流式，失败时退回普通请求）"""
+        cached = self._cache_lookup(prompt)
+        if cached is not None:
+            return cached
+        if stream_enabled():
+            try:
+                content = self._call_stream(prompt)
+                if content:
+                    self._cache_store(prompt, content)
+                    return content
+            except Exception as e:
+                print(f"⚠️ Qwen流式调用失败，改用普通请求: {e}")
         try:
-            response = dashscope.Generation.call(
-                model='qwen-max',
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "你是专业的量化交易分析师。严格遵守以下规则：\n"
-                            "1) 仅输出JSON，无任何额外文字或代码块。\n"
-                            "2) 若置信度不足或无法满足交易所最小名义额/最小数量，必须返回HOLD或空方案。\n"
-                            "3) 禁止同时对同一symbol买卖；禁止输出未在用户提示列出的交易对。\n"
-                            "4) 理由需与输入数据直接相关，避免空话与套话。\n"
-                            "优先输出组合方案：{\"buys\": [ { \"symbol\": \"<BASE>USDT\", \"quote_usdt\": <number> } , ... ], \"sells\": [ { \"symbol\": \"<BASE>USDT\", \"quantity\": <number> } , ... ], \"rationale\": \"<简要理由>\", \"confidence\": <0.0-1.0>}；若无法生成组合方案，退回旧格式 {\"symbol\": \"<BASE>USDT|null\", \"action\": \"BUY|SELL|HOLD\", \"confidence\": 0.0-1.0, \"rationale\": \"简短理由\" }"
-                        ),
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-                result_format="message",
-                temperature=self.temperature,
-                top_p=self.top_p,
-                max_tokens=400,
-            )
-            # 统一按 message 返回解析，避免 output_text 属性异常
-            if getattr(response, 'status_code', None) == 200:
-                output = getattr(response, 'output', None)
-                choices = getattr(output, 'choices', None)
-                if choices and len(choices) > 0 and hasattr(choices[0], 'message') and hasattr(choices[0].message, 'content'):
-                    return choices[0].message.content.strip()
-                else:
-                    return '{"symbol": null, "action": "HOLD", "confidence": 0.0, "rationale": "Qwen返回结构缺少choices"}'
-            else:
-                print(f"❌ Qwen API调用失败: {getattr(response, 'code', 'unknown')} - {getattr(response, 'message', 'unknown')}")
-                return '{"symbol": null, "action": "HOLD", "confidence": 0.0, "rationale": "API调用失败"}'
+            response = dashscope.Generation.call(**self._request_kwargs(prompt))
+            return self._handle_response(prompt, response)
+        except Exception as e:
+            print(f"❌ Qwen API调用失败: {e}")
+            return HOLD_API_FAIL
+    
+    async def acall(self, prompt: str) -> str:
+        """异步调用Qwen API（dashscope.AioGeneration）；旧版SDK无异步接口时退回线程池"""
+        aio_generation = getattr(dashscope, 'AioGeneration', None)
+        if aio_generation is None:
+            return await super().acall(prompt)
+        cached = await self._acache_lookup(prompt)
+        if cached is not None:
+            return cached
+        if stream_enabled():
+            try:
+                content = await self._acall_stream(aio_generation, prompt)
+                if content:
+                    self._cache_store(prompt, content)
+                    return content
+            except Exception as e:
+                print(f"⚠️ Qwen流式调用失败，改用普通请求: {e}")
+        try:
+            response = await aio_generation.call(**self._request_kwargs(prompt))
+            return self._handle_response(prompt, response)
         except Exception as e:
             print(f"❌ Qwen API调用失败: {e}")
-            return '{"symbol": null, "action": "HOLD", "confidence": 0.0, "rationale": "API调用失败"}'
+            return HOLD_API_FAIL
     
     def get_model_name(self) -> str:
         """获取模型名称"""
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM语义缓存
+交易提示词在相邻轮次之间往往只有价格等数值的微小变化，精确匹配几乎总是未命中。
+本模块对提示词做向量化，当余弦相似度达到阈值、提示中价格以外的数值（余额、指标、时间戳等）完全一致、
+且提取的最新价格均在容差内时复用已缓存的响应。
+"""
+
+import os
+import re
+import math
+import time
+import threading
+from typing import Callable, Dict, List, Optional
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+
+# 匹配 "- BTCUSDT: $123.4567" 与 "'BTCUSDT': 123.45" 两种价格写法
+_PRICE_RE = re.compile(r"([A-Z0-9]+USDT)['\"]?:\s*\$?([0-9]+(?:\.[0-9]+)?)")
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+
+def extract_price_vector(prompt: str) -> Dict[str, float]:
+    """从提示词中提取价格向量 {symbol: price}"""
+    out: Dict[str, float] = {}
+    for sym, val in _PRICE_RE.findall(prompt or ""):
+        try:
+            out[sym] = float(val)
+        except ValueError:
+            continue
+    return out
+
+
+def mask_prices(prompt: str) -> str:
+    """将提示词中的价格替换为占位符，得到除价格外的提示词骨架"""
+    return _PRICE_RE.sub(lambda m: m.group(0)[:-len(m.group(2))] + "#", prompt or "")
+
+
+def max_relative_change(prev: Dict[str, float], cur: Dict[str, float]) -> Optional[float]:
+    """计算两组价格的最大相对变化 max(|Δp/p|)；交易对集合不一致时返回None"""
+    if prev.keys() != cur.keys():
+        return None
+    worst = 0.0
+    for sym, p in cur.items():
+        q = prev[sym]
+        base = max(abs(p), abs(q))
+        if base == 0:
+            continue
+        worst = max(worst, abs(p - q) / base)
+    return worst
+
+
+def _normalize(vec: List[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vec))
+    if norm == 0:
+        return vec
+    return [v / norm for v in vec]
+
+
+def _hashing_embedder(dim: int = 512) -> Callable[[str], List[float]]:
+    """无外部依赖的兜底向量化：字符三元组哈希到固定维度（仅用于进程内比较）"""
+    def encode(text: str) -> List[float]:
+        vec = [0.0] * dim
+        for i in range(max(0, len(text) - 2)):
+            vec[hash(text[i:i + 3]) % dim] += 1.0
+        return _normalize(vec)
+    return encode
+
+
+class SemanticCache:
+    """基于余弦相似度+价格容差的近似缓存（TTL+LRU淘汰，线程安全）"""
+
+    def __init__(self, threshold: float = 0.95, price_tol: float = 0.003, maxsize: int = 256,
+                 ttl: float = 600, model_name: str = 'sentence-transformers/all-MiniLM-L6-v2'):
+        """
+        初始化语义缓存
+
+        Args:
+            threshold: 命中所需的最小余弦相似度
+            price_tol: 价格最大相对偏差（0.003即±0.3%）
+            maxsize: 最大条目数
+            ttl: 条目有效期（秒）
+            model_name: sentence-transformers模型名；未安装时退回哈希向量
+        """
+        self.threshold = float(threshold)
+        self.price_tol = float(price_tol)
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = float(ttl)
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+        # 每条记录: {"ns", "skeleton", "vec"(延迟计算), "nums", "response", "prices", "ts"}，按最近使用排序
+        self._entries: List[Dict] = []
+        self._encode: Optional[Callable[[str], List[float]]] = None
+        self._lock = threading.Lock()
+
+    def _load_encoder(self) -> Callable[[str], List[float]]:
+        if SentenceTransformer is not None:
+            try:
+                model = SentenceTransformer(self.model_name)
+                return lambda text: model.encode(text, normalize_embeddings=True).tolist()
+            except Exception as e:
+                print(f"⚠️ 语义缓存模型加载失败，退回哈希向量: {e}")
+        return _hashing_embedder()
+
+    def _embed(self, skeleton: str) -> List[float]:
+        if self._encode is None:
+            self._encode = self._load_encoder()
+        # 价格由容差单独校验，只屏蔽价格字段；其余数值保留在向量化文本中
+        return self._encode(skeleton)
+
+    @staticmethod
+    def _state_numbers(skeleton: str) -> tuple:
+        """价格以外的全部数值（余额、指标、特征、记忆时间戳等）；账户/指标状态变化时不得复用旧响应"""
+        return tuple(_NUMBER_RE.findall(skeleton))
+
+    def lookup(self, namespace: str, prompt: str) -> Optional[str]:
+        """查找近似提示词的缓存响应，未命中返回None"""
+        skeleton = mask_prices(prompt)
+        nums = self._state_numbers(skeleton)
+        prices = extract_price_vector(prompt)
+        now = time.monotonic()
+        # 先按命名空间、非价格数值与价格容差筛选候选（廉价比较），无候选时直接返回，不做向量化
+        with self._lock:
+            self._entries = [e for e in self._entries if now - e["ts"] < self.ttl]
+            candidates = []
+            for e in self._entries:
+                if e["ns"] != namespace or e["nums"] != nums:
+                    continue
+                change = max_relative_change(e["prices"], prices)
+                if change is not None and change <= self.price_tol:
+                    candidates.append(e)
+            if not candidates:
+                self.misses += 1
+                return None
+        # 向量化在锁外进行；条目的向量在首次成为候选时才计算
+        vec = self._embed(skeleton)
+        for e in candidates:
+            if e["vec"] is None:
+                e["vec"] = self._embed(e["skeleton"])
+        with self._lock:
+            best, best_score = None, -1.0
+            for e in candidates:
+                score = sum(a * b for a, b in zip(vec, e["vec"]))
+                if score > best_score:
+                    best, best_score = e, score
+            if best is not None and best_score >= self.threshold:
+                if any(e is best for e in self._entries):
+                    self._entries = [e for e in self._entries if e is not best]
+                    self._entries.append(best)
+                self.hits += 1
+                return best["response"]
+            self.misses += 1
+            return None
+
+    def add(self, namespace: str, prompt: str, response: str) -> None:
+        """写入一条缓存记录（向量延迟到该条目首次可能命中时再计算）"""
+        skeleton = mask_prices(prompt)
+        entry = {
+            "ns": namespace,
+            "skeleton": skeleton,
+            "vec": None,
+            "nums": self._state_numbers(skeleton),
+            "response": response,
+            "prices": extract_price_vector(prompt),
+            "ts": time.monotonic(),
+        }
+        with self._lock:
+            self._entries.append(entry)
+            if len(self._entries) > self.maxsize:
+                del self._entries[:len(self._entries) - self.maxsize]
+
+    def stats(self) -> Dict[str, int]:
+        """返回命中/未命中次数与当前条目数"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def semantic_cache_enabled() -> bool:
+    """LLM_SEMCACHE=1 时启用语义缓存"""
+    return os.getenv('LLM_SEMCACHE', '0').strip() == '1'
+
+
+SEMANTIC_CACHE = SemanticCache(
+    threshold=_env_float('LLM_SEMCACHE_THRESHOLD', 0.95),
+    price_tol=_env_float('LLM_SEMCACHE_PRICE_TOL', 0.003),
+    maxsize=int(_env_float('LLM_SEMCACHE_SIZE', 256)),
+    ttl=_env_float('LLM_SEMCACHE_TTL', 600),
+    model_name=os.getenv('LLM_SEMCACHE_MODEL', 'sentence-transformers/all-MiniLM-L6-v2'),
+)
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Alpha Arena 数值内核AOT预编译脚本
+将RSI/波动率与步长取整的标量循环用numba.pycc编译为扩展模块 core/_alpha_numerics，
+运行时 core/indicators.py 优先导入该模块，免去每个新进程的JIT编译/缓存加载延迟。
+更换Python/numpy版本后需重新执行：python build_aot.py
+"""
+
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT_DIR)
+
+
+def main():
+    """编译并输出扩展模块到core目录"""
+    try:
+        from numba.pycc import CC
+    except ImportError:
+        print("❌ 当前numba不支持AOT编译（需安装包含numba.pycc的numba版本）")
+        return 1
+    from core.indicators import AOT_EXPORTS
+
+    cc = CC('_alpha_numerics')
+    cc.output_dir = os.path.join(ROOT_DIR, 'core')
+    cc.verbose = False
+    for name, func, signature in AOT_EXPORTS:
+        cc.export(name, signature)(func)
+    cc.compile()
+    print(f"✅ 已生成AOT扩展模块: {cc.output_dir}/_alpha_numerics")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
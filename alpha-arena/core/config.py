@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行配置
+集中读取主程序、决策、记忆与行情模块使用的环境变量，进程内只解析一次，避免在热路径上反复调用os.getenv与类型转换
+"""
+
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+
+# 默认记忆文件（JSONL）；旧版默认文件为同目录下的memory.json（整体JSON数组）
+DEFAULT_MEMORY_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'memory.jsonl')
+LEGACY_MEMORY_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'memory.json')
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+@dataclass(frozen=True)
+class Settings:
+    """主程序/决策/记忆/行情模块共用的只读配置"""
+    min_conf: float
+    max_trade_usdt: float
+    max_position_usdt: float
+    memory_path: str
+    memory_max: int
+    memory_enabled: bool
+    rsi_period: int
+    hist_interval: str
+    hist_limit: int
+    decision_cache_ttl: float
+    # 主程序：执行策略与风控、指标门控与冷却、自动运行
+    execution_policy: str
+    min_conf_buy: float
+    min_conf_sell: float
+    trade_mode: str
+    decision_model: str
+    consensus_require_both: bool
+    consensus_log: bool
+    rsi_buy_max: float
+    rsi_sell_min: float
+    max_volatility: float
+    cooldown_sec: int
+    price_max_age_sec: float
+    gating_verbose: bool
+    auto_run: bool
+    auto_run_interval_sec: int
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """从环境变量构建配置，非法取值使用默认值"""
+        # 决策来源（听哪个模型）：支持 deepseek 或 qwen，默认 deepseek
+        decision_model = (os.getenv('DECISION_MODEL', 'deepseek') or 'deepseek').strip().lower()
+        if decision_model not in ('deepseek', 'qwen'):
+            print(f"⚠️ DECISION_MODEL={decision_model} 非法，回退为 deepseek")
+            decision_model = 'deepseek'
+        return cls(
+            min_conf=_env_float('LLM_MIN_CONF', 0.65),
+            max_trade_usdt=_env_float('MAX_TRADE_USDT', 20.0),
+            max_position_usdt=_env_float('MAX_POSITION_USDT_PER_SYMBOL', 50.0),
+            memory_path=os.getenv('MEMORY_FILE', DEFAULT_MEMORY_PATH),
+            memory_max=_env_int('MEMORY_MAX_ITEMS', 10),
+            memory_enabled=(os.getenv('ENABLE_MEMORY', '0').strip() == '1'),
+            rsi_period=_env_int('RSI_PERIOD', 14),
+            hist_interval=os.getenv('HIST_INTERVAL', '3m'),
+            hist_limit=_env_int('HIST_LIMIT', 20),
+            # 决策级缓存有效期（秒），仅重放无交易（HOLD/空方案）的决策；<=0 关闭
+            decision_cache_ttl=_env_float('DECISION_CACHE_TTL', 60.0),
+            execution_policy=os.getenv('EXECUTION_POLICY', 'consensus').strip().lower(),
+            min_conf_buy=_env_float('MIN_CONFIDENCE_BUY', 0.65),
+            min_conf_sell=_env_float('MIN_CONFIDENCE_SELL', 0.65),
+            trade_mode=os.getenv('TRADE_MODE', 'live').strip().lower(),
+            decision_model=decision_model,
+            consensus_require_both=(os.getenv('CONSENSUS_REQUIRE_BOTH', '1').strip() == '1'),
+            # 是否同时请求另一个模型用于决策对比日志；关闭后只初始化并请求 DECISION_MODEL 指定的模型
+            consensus_log=(os.getenv('CONSENSUS_LOG', '1').strip() == '1'),
+            rsi_buy_max=_env_float('RSI_BUY_MAX', 65.0),
+            rsi_sell_min=_env_float('RSI_SELL_MIN', 35.0),
+            max_volatility=_env_float('MAX_VOLATILITY', 0.12),
+            cooldown_sec=_env_int('TRADE_COOLDOWN_SEC', 300),
+            # 本轮开始时批量获取的价格在该秒数内视为新鲜，下单前直接复用，超时才重新批量获取
+            price_max_age_sec=_env_float('PRICE_MAX_AGE_SEC', 5.0),
+            gating_verbose=(os.getenv('GATING_VERBOSE', '0').strip() == '1' or os.getenv('DEBUG', '0').strip() == '1'),
+            auto_run=(os.getenv('AUTO_RUN', '0') == '1'),
+            auto_run_interval_sec=_env_int('AUTO_RUN_INTERVAL_SEC', 60),
+        )
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    获取进程级配置（首次调用时读取环境变量）
+    延迟到首次使用时构建，确保main.py中load_dotenv加载的.env已生效；修改环境变量后可调用reload_settings()重新读取
+    """
+    return Settings.from_env()
+
+
+def reload_settings() -> Settings:
+    """丢弃已缓存的配置并按当前环境变量重新构建（用于运行中热更新配置）"""
+    get_settings.cache_clear()
+    return get_settings()
@@ -5,35 +5,318 @@
 处理LLM交易决策
 """
 
+import asyncio
 import json
-from typing import Dict, Any, List, Optional
-from adapters.llm_base import LLMAdapter
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+from adapters.llm_base import CANNED_RESPONSES, LLMAdapter
+from adapters.llm_cache import ResponseCache, cache_allowed, get_disk_cache, make_cache_key
+from adapters.semantic_cache import mask_prices
 import os
 from .memory import load_memory
+from .config import get_settings
+from .indicators import pct_change, return_features
 
+# orjson解析更快；未安装时使用标准库json
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+# 已安装jsonschema时用预编译校验器校验组合方案结构；未安装时使用等价的手写检查
+try:
+    from jsonschema import Draft7Validator
+except ImportError:
+    Draft7Validator = None
+
+
+# 规范化后的组合方案结构（_sanitize_plan的输出）：通过校验的方案下游可直接按键取值，无需逐项判空
+PLAN_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "buys": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "symbol": {"type": "string", "minLength": 1},
+                    "quote_usdt": {"type": "number", "exclusiveMinimum": 0},
+                },
+                "required": ["symbol", "quote_usdt"],
+            },
+        },
+        "sells": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "symbol": {"type": "string", "minLength": 1},
+                    "quantity": {"type": "number", "exclusiveMinimum": 0},
+                },
+                "required": ["symbol", "quantity"],
+            },
+        },
+        "confidence": {"type": "number"},
+    },
+    "required": ["buys", "sells", "confidence"],
+}
+_PLAN_VALIDATOR = Draft7Validator(PLAN_SCHEMA) if Draft7Validator is not None else None
+
+
+def _valid_plan_items(items: Any, amount_key: str) -> bool:
+    if not isinstance(items, list):
+        return False
+    for x in items:
+        if not isinstance(x, dict):
+            return False
+        sym, amt = x.get("symbol"), x.get(amount_key)
+        if not isinstance(sym, str) or not sym:
+            return False
+        if isinstance(amt, bool) or not isinstance(amt, (int, float)) or amt <= 0:
+            return False
+    return True
+
+
+def is_valid_plan(decision: Any) -> bool:
+    """判断决策是否为结构完整的组合方案（buys/sells每项均含非空symbol与正数金额/数量，confidence为数值）"""
+    if _PLAN_VALIDATOR is not None:
+        return _PLAN_VALIDATOR.is_valid(decision)
+    if not isinstance(decision, dict):
+        return False
+    conf = decision.get("confidence")
+    if isinstance(conf, bool) or not isinstance(conf, (int, float)):
+        return False
+    return (_valid_plan_items(decision.get("buys"), "quote_usdt")
+            and _valid_plan_items(decision.get("sells"), "quantity"))
+
+
+# 决策级响应缓存：同一模型、近似相同的行情快照在TTL内复用上一次的无交易响应（DECISION_CACHE_TTL<=0 关闭）；
+# 与适配器缓存相同，仅对确定性请求（temperature<=0 或 LLM_CACHE_FORCE=1）生效。
+# 只缓存HOLD/空方案：含买卖的决策若被重放，AUTO_RUN会在行情未变时重复下同一笔单
+@lru_cache(maxsize=1)
+def _get_decision_cache(ttl: float) -> ResponseCache:
+    return ResponseCache(maxsize=256, ttl=ttl)
+
+
+def _decision_cache_get(key: str) -> Optional[str]:
+    ttl = get_settings().decision_cache_ttl
+    if ttl <= 0:
+        return None
+    cache = _get_decision_cache(ttl)
+    cached = cache.get(key)
+    if cached is None:
+        disk = get_disk_cache()
+        cached = disk.get(key) if disk is not None else None
+        if cached is not None:
+            cache.put(key, cached)
+    return cached
+
+
+def _decision_cache_put(key: str, response: str) -> None:
+    ttl = get_settings().decision_cache_ttl
+    if ttl <= 0:
+        return
+    _get_decision_cache(ttl).put(key, response)
+    disk = get_disk_cache()
+    if disk is not None:
+        try:
+            disk.put(key, response, ttl=ttl)
+        except Exception as e:
+            print(f"⚠️ 决策缓存写入失败: {e}")
+
+
+def _is_no_trade(decision: Dict[str, Any]) -> bool:
+    """决策不含任何买卖（组合方案buys/sells为空，且旧格式动作为HOLD或缺省）"""
+    return (not decision.get("buys") and not decision.get("sells")
+            and str(decision.get("action") or "HOLD").upper() == "HOLD")
+
+
+# 响应解析路径计数：direct=直接解析，salvaged=剥离代码块/前后缀后解析，fallback=退回文本关键字判断
+PARSE_STATS: Dict[str, int] = {"direct": 0, "salvaged": 0, "fallback": 0}
+
+
+# 兜底决策模板（只读，按需复制）
+_DEFAULT_DECISION = MappingProxyType({
+    "symbol": None,
+    "action": "HOLD",
+    "confidence": 0.0,
+    "rationale": "解析失败，默认观望"
+})
+
+
+def _extract_json(response: str) -> str:
+    """去掉```json代码块与JSON前后的说明文字，返回首个'{'到最后一个'}'之间的内容"""
+    s = response.strip()
+    if s.startswith('```'):
+        s = s.strip('`').split('\n', 1)[-1].rsplit('```', 1)[0]
+    i, j = s.find('{'), s.rfind('}')
+    if 0 <= i < j:
+        s = s[i:j + 1]
+    return s
+
+
+def _compile_price_renderer(symbols: Tuple[str, ...]) -> Optional[Callable[[Dict[str, float]], str]]:
+    """
+    为固定的交易对列表生成展开循环的价格行渲染函数：每个交易对一段内联f-string，
+    运行时不再遍历列表、拼接与join；交易对名不是字母数字时不生成（避免注入源码）
+    """
+    if not symbols or not all(s.isalnum() for s in symbols):
+        return None
+    parts = [f'f"- {s}: ${{cp.get({s!r}, 0):.4f}}"' for s in symbols]
+    src = "def _render(cp):\n    return (\n        " + ' "\\n"\n        '.join(parts) + "\n    )\n"
+    namespace: Dict[str, Any] = {}
+    try:
+        exec(compile(src, '<prompt-prices>', 'exec'), namespace)
+    except SyntaxError:
+        return None
+    return namespace['_render']
+
+
+def _fmt_pct(value: Optional[float]) -> str:
+    """比例值格式化为百分数数值（保留2位小数，不带%号），缺失时为NA"""
+    return f"{value * 100:.2f}" if value is not None else "NA"
 
 
 class DecisionMaker:
     """交易决策引擎"""
     
-    def __init__(self, llm_adapter: LLMAdapter):
+    def __init__(self, llm_adapter: LLMAdapter, symbols: Optional[List[str]] = None):
         """
         初始化决策引擎
         
         Args:
             llm_adapter: LLM适配器实例
+            symbols: 可选，交易对全集（如MarketData.get_symbols()）；提供时预先排序，构建提示词时不再逐次排序
         """
         self.llm_adapter = llm_adapter
         self.model_name = llm_adapter.get_model_name()
+        self._sorted_syms = tuple(sorted(set(symbols))) if symbols else ()
+        self._sym_set = frozenset(self._sorted_syms)
+        self._render_prices = _compile_price_renderer(self._sorted_syms)
         # 提示词约束的最小置信度阈值（低于该值必须HOLD）
-        try:
-            self.min_conf = float(os.getenv('LLM_MIN_CONF', '0.65'))
-        except Exception:
-            self.min_conf = 0.65
+        settings = get_settings()
+        self.min_conf = settings.min_conf
+        # 风控上限（用于提示词）
+        self.max_trade_usdt = settings.max_trade_usdt
+        self.max_position_usdt = settings.max_position_usdt
+        self._log_usage = os.getenv('LLM_LOG_USAGE', '0').strip() == '1'
+        self._build_static_prompts()
+
+    def _build_static_prompts(self) -> None:
+        """
+        预先拼好各提示词中不随行情变化的部分（角色说明、输出格式与约束），每次调用只格式化行情/持仓部分。
+        静态部分整体放在提示词开头、动态数据放在末尾，使每次请求的前缀字节完全相同，便于服务端前缀缓存命中。
+        """
+        self._head_simple = "\n".join([
+            "角色与目标：",
+            "- 你是专业的量化交易分析师，目标是在当前时刻基于输入数据输出一个明确的交易决策。",
+            "",
+            "决策原则：",
+            "- 结合趋势、动量与波动性做出判断；若信息不足或不确定，请选择HOLD。",
+            "- 只在必要时选择BUY或SELL，并给出简短理由。",
+            "",
+            "严格输出要求（仅返回JSON，不要任何其他文字或代码块）：",
+            "{",
+            "    \"symbol\": \"<BASE>USDT|null\",",
+            "    \"action\": \"BUY|SELL|HOLD\",",
+            "    \"confidence\": 0.0-1.0,",
+            "    \"rationale\": \"简短理由（不超过50字）\"",
+            "}",
+            "",
+            "约束：",
+            "- 仅从下方输入数据列出的有效交易对(价格>0)中选择symbol；若无明确选择则返回null。",
+            "- action为HOLD表示观望。confidence为数字，范围[0,1]。",
+            "- 禁止输出解释性文本、标题、前后缀或代码框。",
+            # 强化限制，避免无意义决策
+            f"- 当置信度低于{self.min_conf:.2f}或理由模糊/泛泛而谈时，必须返回HOLD，不要勉强BUY/SELL。",
+            "- 禁止提出金额或数量不足以执行的交易：若无法满足交易所最小名义额(≈5 USDT)或最小数量限制，请返回HOLD。",
+            # 新增：手续费考量
+            "- 在金额与数量的建议中考虑交易所手续费（如0.1%），避免成交后因手续费扣减导致名义额或数量不足；买入可适度上浮金额，卖出可适度下调数量以满足过滤器。",
+            "- 禁止同时对同一symbol给出BUY与SELL。",
+            "- 理由需与输入数据直接相关（趋势/动量/波动），禁止空话或与交易无关的内容。",
+            # 新增：禁止BUY/SELL与空symbol的组合
+            "- 若action为BUY或SELL，symbol必须为具体<BASE>USDT，禁止为null或\"None\"。",
+            "",
+            "输入数据（当前价格，单位：USDT）：",
+        ])
+        self._head_hist = "\n".join([
+            "角色与目标：",
+            "- 你是专业的量化交易分析师，基于历史序列与当前价格输出一个明确的交易决策。",
+            "",
+            "分析指引：",
+            "- 关注区间涨跌幅、近N点收益率均值与波动、末端动量的综合信号；避免过度拟合。",
+            "- 若信号不一致或不可靠，优先选择HOLD。",
+            "",
+            "严格输出要求（仅返回JSON，不要任何额外文字或代码块）：",
+            "{",
+            "    \"symbol\": \"<BASE>USDT|null\",",
+            "    \"action\": \"BUY|SELL|HOLD\",",
+            "    \"confidence\": 0.0-1.0,",
+            "    \"rationale\": \"简短理由（不超过50字）\"",
+            "}",
+            "",
+            "约束：",
+            "- 仅允许从下方输入数据列出的交易对中选择；若无明确选择则返回null。",
+            "- confidence为数字，范围[0,1]；action为HOLD表示观望。",
+            "- 禁止输出解释性文本、标题、前后缀或代码框。",
+            # 强化限制
+            f"- 当置信度低于{self.min_conf:.2f}或信号不一致/不可靠时，必须选择HOLD。",
+            "- 禁止提出不满足最小名义额(≈5 USDT)或最小数量的交易。",
+            # 新增：手续费考量
+            "- 在金额与数量的建议中考虑交易所手续费（如0.1%），避免成交后因手续费扣减导致名义额或数量不足；买入可适度上浮金额，卖出可适度下调数量以满足过滤器。",
+            "- 禁止同时对同一symbol给出BUY与SELL。",
+            "- 理由需具体且与所给历史特征(涨跌幅/均值/波动/末端动量)相关，禁止泛泛而谈。",
+            # 新增：禁止BUY/SELL与空symbol的组合
+            "- 若action为BUY或SELL，symbol必须为具体<BASE>USDT，禁止为null或\"None\"。",
+            "",
+            # 历史特征以紧凑CSV给出，列说明放在静态前缀中以减少每次请求的token
+            "历史特征数据列（CSV，每行一个交易对）：",
+            "- sym=交易对，n=K线条数，chg=区间涨跌幅(%)，mean=近N点收益率均值(%)，std=收益率波动(%)，mom=末端动量(%)，",
+            "  closes=最早8个收盘价(USDT，从旧到新，空格分隔)；NA表示数据不足，n=0表示历史数据不可用。",
+            "",
+            "输入数据：",
+        ])
+        # 强化提示：生成持仓优化方案，明确输出JSON架构
+        self._head_hold = "\n".join([
+            "你是一名加密货币现货交易顾问。请基于当前价格、历史走势与账户持仓，给出可执行的持仓优化方案。",
+            "目标：在控制风险的前提下提高账户的风险回报，允许卖出与买入多个币种。",
+            "",
+            "请严格输出以下JSON格式（不要包含多余文本）：",
+            "{",
+            "  \"buys\": [ { \"symbol\": \"<BASE>USDT\", \"quote_usdt\": <number> } , ... ],",
+            "  \"sells\": [ { \"symbol\": \"<BASE>USDT\", \"quantity\": <number> } , ... ],",
+            "  \"rationale\": \"<简要理由>\",",
+            "  \"confidence\": <0.0-1.0>",
+            "}",
+            "要求：",
+            "- buys中的quote_usdt为买入金额(USDT)，sells中的quantity为卖出数量(基础币数量)。",
+            "- 仅使用你在当前价格中看到的USDT交易对(symbol形如<BASE>USDT)。",
+            "- 如果不需要买或卖，对应数组给空列表[].",
+            "- confidence为整体方案置信度，范围[0,1]。",
+            "- 每一笔买入的quote_usdt应尽量≥5.00（满足交易所最小名义额），若当前可用USDT不足5.00，请优先通过卖出释放USDT后再规划买入，否则将buys设为空。",
+            "- 卖出数量尽量为账户中该资产的全部或合理整数步进，考虑到交易所的数量步长(stepSize)与最小数量(minQty)，可将数量四舍五入到3~6位小数的合理值。",
+            "- 方案中买入金额总和不要超过预计的可用USDT（当前USDT余额 + 卖出预计可入账的USDT）。",
+            # 新增：手续费考量
+            "- 在买入金额与卖出数量的规划中考虑交易所手续费（maker/taker），为避免成交后因手续费扣减导致名义额低于最小限额或数量不达步进，可对买入金额适度上浮、卖出数量适度下调。",
+            "- 如果信息不确定或不需要调整，返回buys和sells均为空，confidence给出合理数值。",
+            # 新增：针对“余额不足”误判的明确约束
+            "- 若USDT余额≥5.00，则不得以‘余额不足’作为理由导致空方案；如选择不买入，应以行情信号/置信度等原因解释，并与输入数据一致。",
+            "- 买入建议的quote_usdt范围为[5.00, min(USDT余额, 单笔上限, 单币持仓上限剩余额度)]，不要编造与输入相矛盾的理由（例如余额充足却声称不足）。",
+            # 新增：当USDT余额充足时，鼓励至少一个买入以便执行层验证
+            "- 当USDT余额≥5.00时，若无显著下跌信号，请在buys中至少给出一个买入项；若选择不买入，必须给出具体信号与风险解释，并降低confidence以反映不确定性。",
+            "",
+            "输入数据：",
+        ])
+        # 动态数据之后的收尾，只提示开始输出
+        self._tail = "\n".join(["", "JSON："])
+        if self._log_usage:
+            sizes = ", ".join(f"{name}={len(head.encode('utf-8'))}B" for name, head in
+                              (("simple", self._head_simple), ("history", self._head_hist), ("holdings", self._head_hold)))
+            print(f"🧩 {self.model_name} 静态提示词前缀: {sizes}")
 
-    def _sanitize_plan(self, plan: Dict[str, Any], prices: Dict[str, float], balances: Dict[str, float]) -> Dict[str, Any]:
+    def _sanitize_plan(self, plan: Dict[str, Any], valid_syms: FrozenSet[str], balances: Dict[str, float]) -> Dict[str, Any]:
         try:
-            valid_syms = {s for s, p in prices.items() if (p or 0) > 0}
             buys_in = plan.get("buys") or []
             sells_in = plan.get("sells") or []
             buys_out: List[Dict[str, Any]] = []
@@ -78,251 +361,168 @@ class DecisionMaker:
                 "confidence": float(plan.get("confidence", 0.0) or 0.0)
             }
 
+    def _format_memory_tail(self) -> str:
+        """格式化最近5条操作记忆摘要（含标题行），未启用记忆或无记录时返回空字符串"""
+        try:
+            mem = load_memory()
+            if not mem:
+                return ""
+            out = ["最近操作记忆（最多展示部分）："]
+            for rec in mem[-5:]:
+                ts = rec.get('timestamp', 'N/A')
+                src = rec.get('decision_model', 'N/A')
+                fd = rec.get('final_decision', {})
+                if isinstance(fd, dict) and ('buys' in fd or 'sells' in fd):
+                    buys_syms = [x.get('symbol') for x in (fd.get('buys') or []) if x.get('symbol')]
+                    sells_syms = [x.get('symbol') for x in (fd.get('sells') or []) if x.get('symbol')]
+                    out.append(f"- [{ts}] 来源={src} | 方案 buys={','.join(buys_syms) or '[]'} sells={','.join(sells_syms) or '[]'}")
+                else:
+                    out.append(f"- [{ts}] 来源={src} | 决策 {fd.get('action','HOLD')} {fd.get('symbol','None')}")
+            return "\n".join(out)
+        except Exception:
+            return ""
+
     def build_prompt(self, market_data: Dict[str, float]) -> str:
         """
         构建交易决策提示词（仅当前价格，结构化约束版）
         """
-        lines = []
-        lines.append("角色与目标：")
-        lines.append("- 你是专业的量化交易分析师，目标是在当前时刻基于输入数据输出一个明确的交易决策。")
-        lines.append("")
-        lines.append("输入数据（当前价格，单位：USDT）：")
         syms = [s for s, p in market_data.items() if (p or 0) > 0]
-        for sym in syms:
-            lines.append(f"- {sym}: ${market_data.get(sym, 0):.4f}")
-        lines.append("")
-        lines.append("决策原则：")
-        lines.append("- 结合趋势、动量与波动性做出判断；若信息不足或不确定，请选择HOLD。")
-        lines.append("- 只在必要时选择BUY或SELL，并给出简短理由。")
-        lines.append("")
-        lines.append("严格输出要求（仅返回JSON，不要任何其他文字或代码块）：")
-        lines.append("{")
-        lines.append("    \"symbol\": \"<BASE>USDT|null\",")
-        lines.append("    \"action\": \"BUY|SELL|HOLD\",")
-        lines.append("    \"confidence\": 0.0-1.0,")
-        lines.append("    \"rationale\": \"简短理由（不超过50字）\"")
-        lines.append("}")
-        lines.append("")
-        lines.append("约束：")
-        lines.append("- 仅从上方列出的有效交易对(价格>0)中选择symbol；若无明确选择则返回null。")
-        lines.append("- action为HOLD表示观望。confidence为数字，范围[0,1]。")
-        lines.append("- 禁止输出解释性文本、标题、前后缀或代码框。")
-        # 强化限制，避免无意义决策
-        lines.append(f"- 当置信度低于{self.min_conf:.2f}或理由模糊/泛泛而谈时，必须返回HOLD，不要勉强BUY/SELL。")
-        lines.append("- 禁止提出金额或数量不足以执行的交易：若无法满足交易所最小名义额(≈5 USDT)或最小数量限制，请返回HOLD。")
-        # 新增：手续费考量
-        lines.append("- 在金额与数量的建议中考虑交易所手续费（如0.1%），避免成交后因手续费扣减导致名义额或数量不足；买入可适度上浮金额，卖出可适度下调数量以满足过滤器。")
-        lines.append("- 禁止同时对同一symbol给出BUY与SELL。")
-        lines.append("- 理由需与输入数据直接相关（趋势/动量/波动），禁止空话或与交易无关的内容。")
-        # 新增：禁止BUY/SELL与空symbol的组合
-        lines.append("- 若action为BUY或SELL，symbol必须为具体<BASE>USDT，禁止为null或\"None\"。")
-        lines.append("")
-        lines.append("JSON：")
-        return "\n".join(lines)
+        lines = [f"- {sym}: ${market_data.get(sym, 0):.4f}" for sym in syms]
+        return "\n".join([self._head_simple, *lines, self._tail])
 
     def build_prompt_with_history(self, current_prices: Dict[str, float], historical: Dict[str, List[float]]) -> str:
         """
         构建包含历史价格信息的提示词（结构化约束版）：提供每个交易对最近N个收盘价、区间涨跌幅、当前价格，并要求基于趋势与动量做出决策。
         """
-        def pct_change(series: List[float]) -> Optional[float]:
-            if not series or len(series) < 2:
-                return None
-            try:
-                start, end = series[0], series[-1]
-                if start == 0:
-                    return None
-                return (end - start) / start
-            except Exception:
-                return None
-        
-        # 简单衍生特征：近N点收益率均值、标准差（波动）、末端两点变化率（动量）
-        def features(series: List[float]) -> Dict[str, Optional[float]]:
-            try:
-                if not series or len(series) < 2:
-                    return {"ret_mean": None, "ret_std": None, "last_momentum": None}
-                returns = []
-                for i in range(1, len(series)):
-                    prev, cur = series[i-1], series[i]
-                    if prev == 0:
-                        returns.append(0.0)
-                    else:
-                        returns.append((cur - prev) / prev)
-                # 均值
-                ret_mean = sum(returns) / len(returns)
-                # 标准差
-                mean = ret_mean
-                var = sum((r - mean) ** 2 for r in returns) / max(1, len(returns) - 1)
-                ret_std = var ** 0.5
-                # 末端动量（最后一段收益率）
-                last_momentum = returns[-1]
-                return {"ret_mean": ret_mean, "ret_std": ret_std, "last_momentum": last_momentum}
-            except Exception:
-                return {"ret_mean": None, "ret_std": None, "last_momentum": None}
-        
-        lines: List[str] = []
-        lines.append("角色与目标：")
-        lines.append("- 你是专业的量化交易分析师，基于历史序列与当前价格输出一个明确的交易决策。")
-        lines.append("")
         # 最近操作记忆摘要（可选）
+        mem_tail = self._format_memory_tail()
+        lines: List[str] = [mem_tail, ""] if mem_tail else []
+        # 动态选择需要分析的交易对：仅考虑当前价格有效(>0)或存在历史数据的交易对
+        use_renderer = False
+        if self._sorted_syms and current_prices.keys() <= self._sym_set and historical.keys() <= self._sym_set:
+            # 按预排序的全集过滤，结果与下方排序一致
+            syms = [s for s in self._sorted_syms if (current_prices.get(s) or 0) > 0 or s in historical]
+            # 全集交易对均参与时（常见情况）价格区块走预生成的展开版本
+            use_renderer = self._render_prices is not None and tuple(syms) == self._sorted_syms
+        else:
+            syms = sorted({k for k, p in current_prices.items() if (p or 0) > 0} | set(historical.keys()))
+        if use_renderer:
+            price_lines = [self._render_prices(current_prices)]
+        else:
+            price_lines = [f"- {sym}: ${current_prices.get(sym, 0):.4f}" for sym in syms]
+        # 每个交易对的历史行由生成器直接展开，整段提示词只join一次
+        return "\n".join([
+            self._head_hist, *lines,
+            "历史特征(CSV)：",
+            "sym,n,chg,mean,std,mom,closes",
+            *(self._history_line(sym, historical.get(sym, [])) for sym in syms),
+            "",
+            "当前价格（USDT）：",
+            *price_lines,
+            self._tail,
+        ])
+
+    @staticmethod
+    def _history_line(sym: str, series: List[float]) -> str:
+        """格式化单个交易对的历史特征CSV行（列定义见静态前缀中的数据列说明）"""
+        if not len(series):
+            return f"{sym},0,NA,NA,NA,NA,"
         try:
-            mem = load_memory()
-            if mem:
-                lines.append("最近操作记忆（最多展示部分）：")
-                # 仅展示最近5条摘要
-                for rec in mem[-5:]:
-                    ts = rec.get('timestamp', 'N/A')
-                    src = rec.get('decision_model', 'N/A')
-                    fd = rec.get('final_decision', {})
-                    if isinstance(fd, dict) and ('buys' in fd or 'sells' in fd):
-                        buys_syms = [x.get('symbol') for x in (fd.get('buys') or []) if x.get('symbol')]
-                        sells_syms = [x.get('symbol') for x in (fd.get('sells') or []) if x.get('symbol')]
-                        lines.append(f"- [{ts}] 来源={src} | 方案 buys={','.join(buys_syms) or '[]'} sells={','.join(sells_syms) or '[]'}")
-                    else:
-                        lines.append(f"- [{ts}] 来源={src} | 决策 {fd.get('action','HOLD')} {fd.get('symbol','None')}")
-                lines.append("")
+            change = pct_change(series)
+            fts = return_features(series)
+            ret_mean, ret_std, last_mom = fts["ret_mean"], fts["ret_std"], fts["last_momentum"]
         except Exception:
-            pass
-        lines.append("历史价格（从旧到新，单位：USDT）与特征摘要：")
-        # 动态选择需要分析的交易对：仅考虑当前价格有效(>0)或存在历史数据的交易对
-        syms = sorted({k for k, p in current_prices.items() if (p or 0) > 0} | set(historical.keys()))
-        for sym in syms:
-            series = historical.get(sym, [])
-            if series:
-                change = pct_change(series)
-                change_str = f"{change*100:.2f}%" if change is not None else "N/A"
-                preview = ", ".join(f"{p:.2f}" for p in series[:8])
-                fts = features(series)
-                ft_ret_mean = f"{(fts['ret_mean'] or 0.0)*100:.2f}%" if fts['ret_mean'] is not None else "N/A"
-                ft_ret_std = f"{(fts['ret_std'] or 0.0)*100:.2f}%" if fts['ret_std'] is not None else "N/A"
-                ft_last_mom = f"{(fts['last_momentum'] or 0.0)*100:.2f}%" if fts['last_momentum'] is not None else "N/A"
-                lines.append(f"- {sym}: [{preview} ... 共{len(series)}条] | 区间涨跌幅: {change_str} | 近N点: 均值 {ft_ret_mean}, 波动 {ft_ret_std}, 动量 {ft_last_mom}")
-            else:
-                lines.append(f"- {sym}: 历史数据不可用")
-        
-        lines.append("")
-        lines.append("当前价格（USDT）：")
-        for sym in syms:
-            price = current_prices.get(sym, 0)
-            lines.append(f"- {sym}: ${price:.4f}")
-        lines.append("")
-        lines.append("分析指引：")
-        lines.append("- 关注区间涨跌幅、近N点收益率均值与波动、末端动量的综合信号；避免过度拟合。")
-        lines.append("- 若信号不一致或不可靠，优先选择HOLD。")
-        lines.append("")
-        lines.append("严格输出要求（仅返回JSON，不要任何额外文字或代码块）：")
-        lines.append("{")
-        lines.append("    \"symbol\": \"<BASE>USDT|null\",")
-        lines.append("    \"action\": \"BUY|SELL|HOLD\",")
-        lines.append("    \"confidence\": 0.0-1.0,")
-        lines.append("    \"rationale\": \"简短理由（不超过50字）\"")
-        lines.append("}")
-        lines.append("")
-        lines.append("约束：")
-        lines.append("- 仅允许从上方列出的交易对中选择；若无明确选择则返回null。")
-        lines.append("- confidence为数字，范围[0,1]；action为HOLD表示观望。")
-        lines.append("- 禁止输出解释性文本、标题、前后缀或代码框。")
-        # 强化限制
-        lines.append(f"- 当置信度低于{self.min_conf:.2f}或信号不一致/不可靠时，必须选择HOLD。")
-        lines.append("- 禁止提出不满足最小名义额(≈5 USDT)或最小数量的交易。")
-        # 新增：手续费考量
-        lines.append("- 在金额与数量的建议中考虑交易所手续费（如0.1%），避免成交后因手续费扣减导致名义额或数量不足；买入可适度上浮金额，卖出可适度下调数量以满足过滤器。")
-        lines.append("- 禁止同时对同一symbol给出BUY与SELL。")
-        lines.append("- 理由需具体且与所给历史特征(涨跌幅/均值/波动/末端动量)相关，禁止泛泛而谈。")
-        # 新增：禁止BUY/SELL与空symbol的组合
-        lines.append("- 若action为BUY或SELL，symbol必须为具体<BASE>USDT，禁止为null或\"None\"。")
-        lines.append("")
-        lines.append("JSON：")
-        return "\n".join(lines)
+            change = ret_mean = ret_std = last_mom = None
+        preview = " ".join(f"{p:.2f}" for p in series[:8])
+        return (f"{sym},{len(series)},{_fmt_pct(change)},{_fmt_pct(ret_mean)},"
+                f"{_fmt_pct(ret_std)},{_fmt_pct(last_mom)},{preview}")
 
     def build_prompt_with_holdings(self, prices: dict, historical: dict, balances: dict) -> str:
-        # 强化提示：生成持仓优化方案，明确输出JSON架构
-        lines = []
-        lines.append("你是一名加密货币现货交易顾问。请基于当前价格、历史走势与账户持仓，给出可执行的持仓优化方案。")
-        lines.append("目标：在控制风险的前提下提高账户的风险回报，允许卖出与买入多个币种。")
-        lines.append("")
-        lines.append("输入数据：")
-        lines.append(f"- 当前价格(USDT计价): {prices}")
-        lines.append(f"- 历史数据概览(可能省略细节): {[k for k in historical.keys()]}")
-        lines.append(f"- 账户持仓: {balances}")
         # 新增：将USDT余额与风控上限明确结构化给出，避免模型误判“余额不足”
         try:
             usdt_bal = float(balances.get('USDT', 0.0) or 0.0)
         except Exception:
             usdt_bal = 0.0
-        try:
-            max_trade_usdt = float(os.getenv('MAX_TRADE_USDT', '20') or 20)
-        except Exception:
-            max_trade_usdt = 20.0
-        try:
-            max_position_usdt = float(os.getenv('MAX_POSITION_USDT_PER_SYMBOL', '50') or 50)
-        except Exception:
-            max_position_usdt = 50.0
-        lines.append(f"- USDT余额(可用于买入): {usdt_bal:.4f}")
-        lines.append(f"- 风控上限: 单笔买入≤{max_trade_usdt:.2f} USDT, 单币持仓≤{max_position_usdt:.2f} USDT")
-        lines.append("- 通用最小名义额参考: 5.00 USDT（不同交易对可能略有差异，最终以交易所过滤器为准）")
-        lines.append("")
+        lines = [
+            f"- 当前价格(USDT计价): {prices}",
+            f"- 历史数据概览(可能省略细节): {list(historical.keys())}",
+            f"- 账户持仓: {balances}",
+            f"- USDT余额(可用于买入): {usdt_bal:.4f}",
+            f"- 风控上限: 单笔买入≤{self.max_trade_usdt:.2f} USDT, 单币持仓≤{self.max_position_usdt:.2f} USDT",
+            "- 通用最小名义额参考: 5.00 USDT（不同交易对可能略有差异，最终以交易所过滤器为准）",
+        ]
         # 最近操作记忆摘要（可选）
-        try:
-            mem = load_memory()
-            if mem:
-                lines.append("最近操作记忆（最多展示部分）：")
-                for rec in mem[-5:]:
-                    ts = rec.get('timestamp', 'N/A')
-                    src = rec.get('decision_model', 'N/A')
-                    fd = rec.get('final_decision', {})
-                    if isinstance(fd, dict) and ('buys' in fd or 'sells' in fd):
-                        buys_syms = [x.get('symbol') for x in (fd.get('buys') or []) if x.get('symbol')]
-                        sells_syms = [x.get('symbol') for x in (fd.get('sells') or []) if x.get('symbol')]
-                        lines.append(f"- [{ts}] 来源={src} | 方案 buys={','.join(buys_syms) or '[]'} sells={','.join(sells_syms) or '[]'}")
-                    else:
-                        lines.append(f"- [{ts}] 来源={src} | 决策 {fd.get('action','HOLD')} {fd.get('symbol','None')}")
-                lines.append("")
-        except Exception:
-            pass
-        lines.append("请严格输出以下JSON格式（不要包含多余文本）：")
-        lines.append("{")
-        lines.append("  \"buys\": [ { \"symbol\": \"<BASE>USDT\", \"quote_usdt\": <number> } , ... ],")
-        lines.append("  \"sells\": [ { \"symbol\": \"<BASE>USDT\", \"quantity\": <number> } , ... ],")
-        lines.append("  \"rationale\": \"<简要理由>\",")
-        lines.append("  \"confidence\": <0.0-1.0>")
-        lines.append("}")
-        lines.append("要求：")
-        lines.append("- buys中的quote_usdt为买入金额(USDT)，sells中的quantity为卖出数量(基础币数量)。")
-        lines.append("- 仅使用你在当前价格中看到的USDT交易对(symbol形如<BASE>USDT)。")
-        lines.append("- 如果不需要买或卖，对应数组给空列表[].")
-        lines.append("- confidence为整体方案置信度，范围[0,1]。")
-        lines.append("- 每一笔买入的quote_usdt应尽量≥5.00（满足交易所最小名义额），若当前可用USDT不足5.00，请优先通过卖出释放USDT后再规划买入，否则将buys设为空。")
-        lines.append("- 卖出数量尽量为账户中该资产的全部或合理整数步进，考虑到交易所的数量步长(stepSize)与最小数量(minQty)，可将数量四舍五入到3~6位小数的合理值。")
-        lines.append("- 方案中买入金额总和不要超过预计的可用USDT（当前USDT余额 + 卖出预计可入账的USDT）。")
-        # 新增：手续费考量
-        lines.append("- 在买入金额与卖出数量的规划中考虑交易所手续费（maker/taker），为避免成交后因手续费扣减导致名义额低于最小限额或数量不达步进，可对买入金额适度上浮、卖出数量适度下调。")
-        lines.append("- 如果信息不确定或不需要调整，返回buys和sells均为空，confidence给出合理数值。")
-        # 新增：针对“余额不足”误判的明确约束
-        lines.append("- 若USDT余额≥5.00，则不得以‘余额不足’作为理由导致空方案；如选择不买入，应以行情信号/置信度等原因解释，并与输入数据一致。")
-        lines.append("- 买入建议的quote_usdt范围为[5.00, min(USDT余额, 单笔上限, 单币持仓上限剩余额度)]，不要编造与输入相矛盾的理由（例如余额充足却声称不足）。")
-        # 新增：当USDT余额充足时，鼓励至少一个买入以便执行层验证
-        lines.append("- 当USDT余额≥5.00时，若无显著下跌信号，请在buys中至少给出一个买入项；若选择不买入，必须给出具体信号与风险解释，并降低confidence以反映不确定性。")
-        return "\n".join(lines)
+        mem_tail = self._format_memory_tail()
+        if mem_tail:
+            lines.extend(["", mem_tail])
+        return "\n".join([self._head_hold, *lines, self._tail])
 
-    def get_decision(self, prices: dict, historical: dict, balances: dict) -> dict:
-        # 构建提示（优先包含持仓）
+    def _prepare_decision(self, prices: dict, historical: dict, balances: dict):
+        """构建提示词并查询决策缓存，返回(提示词, 缓存键或None, 缓存的响应或None)"""
+        # 构建提示（优先包含持仓）；提示词使用原始价格，避免低价币被截断
         try:
             prompt = self.build_prompt_with_holdings(prices, historical, balances) if balances else self.build_prompt_with_history(prices, historical)
         except Exception:
             prompt = self.build_prompt_with_history(prices, historical)
-        # 调用模型
-        response = self.llm_adapter.call(prompt)
-        # 解析：支持新格式(buys/sells)与旧格式(symbol/action)
-        import json
+        # 与适配器缓存一致，仅缓存确定性请求（temperature<=0 或 LLM_CACHE_FORCE=1），避免重放采样得到的决策
+        if not cache_allowed(getattr(self.llm_adapter, 'temperature', 0.0)):
+            return prompt, None, None
+        # 缓存键：提示词骨架（价格替换为占位符）+ 6位有效数字的价格，使近似相同的行情快照命中同一条缓存
+        key_prices = sorted((s, float(f"{float(p or 0.0):.6g}")) for s, p in prices.items())
+        key = make_cache_key(kind='decision', model=self.model_name, prompt=mask_prices(prompt), prices=key_prices)
+        return prompt, key, _decision_cache_get(key)
+
+    def _finish_decision(self, response: str, from_cache: bool, key: str, prices: dict, balances: dict) -> dict:
+        """解析模型响应，并缓存高置信度的新无交易响应"""
+        # 有效交易对（价格>0）每次决策只计算一次，供新旧两种响应格式的校验共用
+        valid_syms = frozenset(s for s, p in prices.items() if (p or 0) > 0)
+        decision = self._parse_response(response, valid_syms, balances)
+        if self._log_usage and not from_cache:
+            print(f"🧾 {self.model_name} 响应解析累计: " + ", ".join(f"{k}={v}" for k, v in PARSE_STATS.items()))
+        # 仅缓存无交易响应（避免重放买卖导致重复下单）；低置信度响应不缓存，避免在TTL内固化不可靠的输出
+        if (key is not None and not from_cache and _is_no_trade(decision)
+                and float(decision.get("confidence", 0.0) or 0.0) >= self.min_conf):
+            _decision_cache_put(key, response)
+        return decision
+
+    def get_decision(self, prices: dict, historical: dict, balances: dict) -> dict:
+        prompt, key, response = self._prepare_decision(prices, historical, balances)
+        # 调用模型（优先命中决策缓存）
+        from_cache = response is not None
+        if not from_cache:
+            response = self.llm_adapter.call(prompt)
+        return self._finish_decision(response, from_cache, key, prices, balances)
+
+    async def aget_decision(self, prices: dict, historical: dict, balances: dict) -> dict:
+        """get_decision的异步版本：通过适配器的acall请求模型，便于多个模型用asyncio.gather并发"""
+        # 提示词构建（读取记忆）与决策缓存读写涉及磁盘，放到线程池执行，不阻塞事件循环
+        loop = asyncio.get_running_loop()
+        prompt, key, response = await loop.run_in_executor(None, self._prepare_decision, prices, historical, balances)
+        from_cache = response is not None
+        if not from_cache:
+            response = await self.llm_adapter.acall(prompt)
+        return await loop.run_in_executor(None, self._finish_decision, response, from_cache, key, prices, balances)
+
+    def _parse_response(self, response: str, valid_syms: FrozenSet[str], balances: dict) -> dict:
+        """解析模型响应：支持新格式(buys/sells)与旧格式(symbol/action)，无法解析时退回文本关键字判断"""
         decision = {}
         try:
-            parsed = json.loads(response)
+            # 兜底响应为固定字符串，直接取预解析结果
+            canned = CANNED_RESPONSES.get(response)
+            if canned is not None:
+                parsed = dict(canned)
+            elif response.startswith('{') and response.endswith('}'):
+                parsed = json_loads(response)
+                PARSE_STATS["direct"] += 1
+            else:
+                # 模型偶尔包裹代码块或附带说明文字，先截取JSON片段再解析，避免直接落入文本兜底
+                parsed = json_loads(_extract_json(response))
+                PARSE_STATS["salvaged"] += 1
             # 新格式
             if isinstance(parsed, dict) and ("buys" in parsed or "sells" in parsed):
-                cleaned = self._sanitize_plan(parsed, prices, balances)
+                cleaned = self._sanitize_plan(parsed, valid_syms, balances)
                 return cleaned
             # 旧格式（加入符号与动作合法性校验）
-            valid_syms = {s for s, p in prices.items() if (p or 0) > 0}
             sym_raw = parsed.get("symbol")
             act_raw = parsed.get("action")
             action = (str(act_raw or "HOLD").upper())
@@ -337,6 +537,7 @@ class DecisionMaker:
             return decision
         except Exception:
             # 兜底：简单文本解析（旧逻辑）
+            PARSE_STATS["fallback"] += 1
             txt = str(response).upper()
             if "BUY" in txt:
                 decision["action"] = "BUY"
@@ -378,11 +579,11 @@ class DecisionMaker:
         rationale = decision.get('rationale', '无理由')
         return f"   决策: {action} {symbol}\n   信心: {confidence:.2f}\n   理由: {rationale}"
 
+    @staticmethod
+    def parse_stats() -> Dict[str, int]:
+        """获取进程内响应解析路径计数（direct/salvaged/fallback），用于观察JSON兜底的触发频率"""
+        return dict(PARSE_STATS)
+
     def get_default_decision(self) -> Dict[str, Any]:
-        """获取默认决策"""
-        return {
-            "symbol": None,
-            "action": "HOLD",
-            "confidence": 0.0,
-            "rationale": "解析失败，默认观望"
-        }
+        """获取默认决策（返回副本：决策会被下游补充字段并写入记忆，只读视图无法序列化）"""
+        return dict(_DEFAULT_DECISION)
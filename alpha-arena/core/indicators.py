@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+技术指标计算
+基于NumPy的向量化实现（区间涨跌幅、收益率特征、RSI、波动率），供市场数据模块与决策提示词共用
+安装numba时RSI/波动率（及下单数量的步长取整）改用编译后的标量循环，避免小数组上的NumPy调用开销；
+优先加载 build_aot.py 预编译的扩展模块，其次JIT编译，都不可用时使用纯Python/NumPy实现
+"""
+
+import math
+from functools import lru_cache
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# AOT预编译扩展（python build_aot.py 生成到core目录）：导入即用，无JIT编译延迟；与当前numpy不兼容等任何失败都回退
+try:
+    from . import _alpha_numerics
+except Exception:
+    _alpha_numerics = None
+
+
+def as_array(series: Sequence[float]) -> np.ndarray:
+    """将收盘价序列转换为float64数组（已是数组时不复制）"""
+    return np.asarray(series, dtype=np.float64)
+
+
+@lru_cache(maxsize=32)
+def _ema_weights(n: int) -> np.ndarray:
+    """
+    长度为n的EMA（k=2/(n+1)，以首个值为种子）展开后的权重：
+    ema = (1-k)^(n-1)*v0 + Σ k*(1-k)^(n-1-i)*vi
+    """
+    k = 2.0 / (n + 1)
+    w = k * (1.0 - k) ** np.arange(n - 1, -1, -1, dtype=np.float64)
+    w[0] = (1.0 - k) ** (n - 1)
+    w.setflags(write=False)
+    return w
+
+
+def _rsi_loop(arr: np.ndarray, period: int) -> float:
+    """RSI标量循环（供numba编译），调用方保证 len(arr) >= period + 1"""
+    n = arr.shape[0]
+    k = 2.0 / (period + 1)
+    start = n - period
+    avg_gain = 0.0
+    avg_loss = 0.0
+    for i in range(start, n):
+        change = arr[i] - arr[i - 1]
+        gain = change if change > 0.0 else 0.0
+        loss = -change if change < 0.0 else 0.0
+        if i == start:
+            avg_gain = gain
+            avg_loss = loss
+        else:
+            avg_gain = gain * k + avg_gain * (1.0 - k)
+            avg_loss = loss * k + avg_loss * (1.0 - k)
+    if avg_loss == 0.0:
+        return 100.0
+    rsi_value = 100.0 - (100.0 / (1.0 + avg_gain / avg_loss))
+    return max(0.0, min(100.0, rsi_value))
+
+
+def _vol_loop(arr: np.ndarray) -> float:
+    """波动率标量循环（供numba编译），无有效收益率时返回NaN"""
+    count = 0
+    total = 0.0
+    for i in range(1, arr.shape[0]):
+        if arr[i - 1] > 0.0:
+            total += (arr[i] - arr[i - 1]) / arr[i - 1]
+            count += 1
+    if count == 0:
+        return np.nan
+    mean = total / count
+    sq = 0.0
+    for i in range(1, arr.shape[0]):
+        if arr[i - 1] > 0.0:
+            r = (arr[i] - arr[i - 1]) / arr[i - 1] - mean
+            sq += r * r
+    return (sq / max(1, count - 1)) ** 0.5
+
+
+def _round_to_step_loop(quantity: float, step_size: float) -> float:
+    """按步长向下取整（供numba编译），step_size<=0时原样返回；调用方负责类型与非有限值检查"""
+    if step_size <= 0.0:
+        return quantity
+    return max(0.0, math.floor(quantity / step_size) * step_size)
+
+
+# 导出给AOT构建脚本的内核：(导出名, 标量循环, 签名)
+AOT_EXPORTS = (
+    ('rsi_loop', _rsi_loop, 'f8(f8[:], i8)'),
+    ('vol_loop', _vol_loop, 'f8(f8[:])'),
+    ('round_to_step', _round_to_step_loop, 'f8(f8, f8)'),
+)
+
+round_to_step_kernel = _round_to_step_loop
+if _alpha_numerics is not None:
+    _rsi_kernel = _alpha_numerics.rsi_loop
+    _vol_kernel = _alpha_numerics.vol_loop
+    round_to_step_kernel = _alpha_numerics.round_to_step
+elif njit is not None:
+    try:
+        # 与build_aot.py的AOT编译保持相同选项（不启用fastmath），两条路径结果逐位一致
+        _rsi_kernel = njit(cache=True)(_rsi_loop)
+        _vol_kernel = njit(cache=True)(_vol_loop)
+        round_to_step_kernel = njit(cache=True)(_round_to_step_loop)
+        # 导入时预热编译（cache=True下后续启动直接加载缓存），避免首个决策周期承担JIT延迟
+        # 行情缓冲以只读视图传入，numba对只读数组单独特化，一并预热
+        _warm = np.zeros(32)
+        _rsi_kernel(_warm, 14)
+        _vol_kernel(_warm)
+        _warm.flags.writeable = False
+        _rsi_kernel(_warm, 14)
+        _vol_kernel(_warm)
+        del _warm
+        round_to_step_kernel(1.0, 0.1)
+    except Exception as e:
+        print(f"⚠️ numba编译指标函数失败，使用NumPy实现: {e}")
+        _rsi_kernel = _vol_kernel = None
+        round_to_step_kernel = _round_to_step_loop
+else:
+    _rsi_kernel = _vol_kernel = None
+
+
+def pct_change(series: Sequence[float]) -> Optional[float]:
+    """区间涨跌幅 (末值-首值)/首值；不足两个点或首值为0时返回None"""
+    arr = as_array(series)
+    if arr.size < 2 or arr[0] == 0:
+        return None
+    return float((arr[-1] - arr[0]) / arr[0])
+
+
+def return_features(series: Sequence[float]) -> Dict[str, Optional[float]]:
+    """近N点收益率均值、标准差（波动）与末端动量（最后一段收益率）；前值为0的点收益率记为0"""
+    arr = as_array(series)
+    if arr.size < 2:
+        return {"ret_mean": None, "ret_std": None, "last_momentum": None}
+    prev = arr[:-1]
+    diff = np.diff(arr)
+    returns = np.divide(diff, prev, out=np.zeros_like(diff), where=prev != 0)
+    ret_mean = float(returns.mean())
+    var = float(np.square(returns - ret_mean).sum()) / max(1, returns.size - 1)
+    return {"ret_mean": ret_mean, "ret_std": var ** 0.5, "last_momentum": float(returns[-1])}
+
+
+def rsi(series: Sequence[float], period: int = 14) -> Optional[float]:
+    """RSI：对最近period段涨跌幅分别做EMA平滑；数据不足period+1个点时返回None"""
+    arr = as_array(series)
+    if period < 1 or arr.size < period + 1:
+        return None
+    if _rsi_kernel is not None:
+        return float(_rsi_kernel(arr, period))
+    diff = np.diff(arr[-(period + 1):])
+    w = _ema_weights(period)
+    avg_gain = float(np.clip(diff, 0.0, None) @ w)
+    avg_loss = float(np.clip(-diff, 0.0, None) @ w)
+    if avg_loss == 0:
+        return 100.0
+    rs = avg_gain / avg_loss
+    return max(0.0, min(100.0, 100.0 - (100.0 / (1.0 + rs))))
+
+
+def volatility(series: Sequence[float]) -> Optional[float]:
+    """收益率样本标准差（跳过前值≤0的点）；不足3个点或无有效收益率时返回None"""
+    arr = as_array(series)
+    if arr.size < 3:
+        return None
+    if _vol_kernel is not None:
+        vol = float(_vol_kernel(arr))
+        return None if vol != vol else vol
+    prev = arr[:-1]
+    mask = prev > 0
+    returns = np.diff(arr)[mask] / prev[mask]
+    if returns.size == 0:
+        return None
+    mean = returns.mean()
+    var = float(np.square(returns - mean).sum()) / max(1, returns.size - 1)
+    return var ** 0.5
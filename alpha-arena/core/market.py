@@ -5,11 +5,69 @@
 获取和管理市场数据
 """
 
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence, Tuple
+import threading
+import numpy as np
 from adapters.exchange_api import ExchangeAPI
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+from . import indicators
+from .config import get_settings
 import os
 
 
+class _CloseBuffer:
+    """单个交易对定长的K线缓冲（开盘时间与收盘价各一个连续数组），每轮只合并新增的K线"""
+
+    __slots__ = ('open_times', 'closes')
+
+    def __init__(self, open_times: np.ndarray, closes: np.ndarray):
+        self.open_times = np.array(open_times, dtype=np.int64)
+        self.closes = np.array(closes, dtype=np.float64)
+
+    def merge(self, open_times: np.ndarray, closes: np.ndarray) -> bool:
+        """
+        合并以缓冲中最后一根K线为起点的增量数据（最后一根通常是未收盘K线，收盘价需覆盖）
+        无法对齐或新增条数可能超出本次返回范围时返回False，由调用方全量刷新
+        """
+        n = self.closes.size
+        if open_times.size == 0 or open_times.size >= n or open_times[0] != self.open_times[-1]:
+            return False
+        self.closes[-1] = closes[0]
+        k = open_times.size - 1
+        if k:
+            # 丢弃最旧的k根，末尾追加新K线
+            self.open_times[:-k] = self.open_times[k:]
+            self.open_times[-k:] = open_times[1:]
+            self.closes[:-k] = self.closes[k:]
+            self.closes[-k:] = closes[1:]
+        return True
+
+    def view(self) -> np.ndarray:
+        """返回收盘价的只读视图（不复制）"""
+        out = self.closes.view()
+        out.flags.writeable = False
+        return out
+
+
+# 历史K线缓冲：{(symbol, interval): _CloseBuffer}，模块级保存，AUTO_RUN下跨轮次复用
+_HISTORY: Dict[Tuple[str, str], _CloseBuffer] = {}
+_HISTORY_LOCK = threading.Lock()
+
+# 指标结果缓存：{symbol: (序列摘要, 指标)}，每个交易对只保留最近一次；收盘价序列未变化时跳过重算
+_INDICATOR_CACHE: Dict[str, Tuple[Tuple[int, int, int], Dict[str, Optional[float]]]] = {}
+
+
+def _series_digest(arr: np.ndarray, rsi_period: int) -> Tuple[int, int, int]:
+    """收盘价序列的内容摘要（按字节哈希），连同长度与RSI周期作为缓存校验值"""
+    data = arr.tobytes()
+    h = xxhash.xxh64_intdigest(data) if xxhash is not None else hash(data)
+    return (h, arr.size, rsi_period)
+
+
 class MarketData:
     """市场数据管理器"""
     
@@ -59,24 +117,44 @@ class MarketData:
         """
         return self.exchange_api.get_single_price(symbol)
     
-    def get_historical_prices(self, interval: str = None, limit: int = None) -> Dict[str, List[float]]:
+    def get_historical_prices(self, interval: str = None, limit: int = None) -> Dict[str, np.ndarray]:
         """
         获取所有代币的历史收盘价序列（从旧到新），支持从环境变量读取默认配置
+        已缓存的交易对只增量拉取上次最后一根K线之后的数据，原地滚动更新缓冲
         
         Args:
             interval: K线周期（默认从环境变量HIST_INTERVAL，若无则3m）
             limit: 返回的K线条数（默认从环境变量HIST_LIMIT，若无则20）
         Returns:
-            历史价格序列字典，格式为{symbol: [p1, p2, ..., pn]}
+            历史价格序列字典，格式为{symbol: 收盘价float64只读数组}，获取失败的交易对为空数组
+            （数组与缓冲共享内存，下一轮更新后内容会变化，需跨轮保留时请自行复制）
         """
         if interval is None:
-            interval = os.getenv('HIST_INTERVAL', '3m')
+            interval = get_settings().hist_interval
         if limit is None:
-            try:
-                limit = int(os.getenv('HIST_LIMIT', '20'))
-            except Exception:
-                limit = 20
-        return self.exchange_api.get_historical_prices(self.symbols, interval=interval, limit=limit)
+            limit = get_settings().hist_limit
+        with _HISTORY_LOCK:
+            cached = {s: _HISTORY.get((s, interval)) for s in self.symbols}
+            cached = {s: buf for s, buf in cached.items() if buf is not None and buf.closes.size == limit}
+            merged = set()
+            if cached:
+                start_times = {s: int(buf.open_times[-1]) for s, buf in cached.items()}
+                delta = self.exchange_api.get_historical_klines(list(cached), interval=interval, limit=limit, start_times=start_times)
+                merged = {s for s, (open_times, closes) in delta.items() if cached[s].merge(open_times, closes)}
+            missing = [s for s in self.symbols if s not in merged]
+            if missing:
+                full = self.exchange_api.get_historical_klines(missing, interval=interval, limit=limit)
+                for s, (open_times, closes) in full.items():
+                    if closes.size:
+                        _HISTORY[(s, interval)] = _CloseBuffer(open_times, closes)
+                    else:
+                        _HISTORY.pop((s, interval), None)
+            empty = np.empty(0, dtype=np.float64)
+            out: Dict[str, np.ndarray] = {}
+            for s in self.symbols:
+                buf = _HISTORY.get((s, interval))
+                out[s] = buf.view() if buf is not None else empty
+            return out
     
     def get_symbols(self) -> List[str]:
         """获取支持的代币列表"""
@@ -104,7 +182,7 @@ class MarketData:
                 lines.append(f"   {symbol}: 获取失败")
         return "\n".join(lines)
     
-    def format_historical_for_display(self, historical: Dict[str, List[float]], max_points: Optional[int] = 8) -> str:
+    def format_historical_for_display(self, historical: Dict[str, Sequence[float]], max_points: Optional[int] = 8) -> str:
         """
         格式化历史价格用于显示（仅展示前 max_points 个收盘价）
         
@@ -116,7 +194,7 @@ class MarketData:
         """
         lines = []
         for symbol, series in historical.items():
-            if series:
+            if len(series):
                 show = series[:max_points] if max_points else series
                 series_str = ", ".join(f"{p:.2f}" for p in show)
                 lines.append(f"   {symbol}: [{series_str}] ... ({len(series)}条)")
@@ -128,6 +206,10 @@ class MarketData:
         """获取账户资产余额（现货），返回数量>0的资产"""
         return self.exchange_api.get_account_balances()
     
+    def get_account_balance_snapshot(self) -> Tuple[Dict[str, float], Dict[str, float]]:
+        """获取账户资产的(总余额, 可用余额)，两者取自同一账户快照"""
+        return self.exchange_api.get_balance_snapshot()
+    
     def format_balances_for_display(self, balances: Dict[str, float]) -> str:
         """格式化账户持仓用于显示"""
         if not balances:
@@ -137,63 +219,40 @@ class MarketData:
             lines.append(f"   {asset}: {amount:g}")
         return "\n".join(lines)
 
-    # 指标计算
-    def _compute_rsi(self, series: List[float], period: int = 14) -> Optional[float]:
+    # 指标计算（向量化实现见core.indicators）
+    def _compute_rsi(self, series: Sequence[float], period: int = 14) -> Optional[float]:
         try:
-            if not series or len(series) < period + 1:
-                return None
-            gains = []
-            losses = []
-            for i in range(1, len(series)):
-                change = series[i] - series[i-1]
-                gains.append(max(change, 0.0))
-                losses.append(max(-change, 0.0))
-            def _ema(values: List[float], p: int) -> float:
-                k = 2 / (p + 1)
-                ema = values[0]
-                for v in values[1:]:
-                    ema = v * k + ema * (1 - k)
-                return ema
-            avg_gain = _ema(gains[-period:], period)
-            avg_loss = _ema(losses[-period:], period)
-            if avg_loss == 0:
-                return 100.0
-            rs = avg_gain / avg_loss
-            rsi = 100.0 - (100.0 / (1.0 + rs))
-            return max(0.0, min(100.0, rsi))
+            return indicators.rsi(series, period)
         except Exception:
             return None
 
-    def _compute_volatility(self, series: List[float]) -> Optional[float]:
+    def _compute_volatility(self, series: Sequence[float]) -> Optional[float]:
         try:
-            if not series or len(series) < 3:
-                return None
-            returns: List[float] = []
-            for i in range(1, len(series)):
-                prev, cur = series[i-1], series[i]
-                if prev <= 0:
-                    continue
-                returns.append((cur - prev) / prev)
-            if not returns:
-                return None
-            mean = sum(returns) / len(returns)
-            var = sum((r - mean) ** 2 for r in returns) / max(1, len(returns) - 1)
-            return var ** 0.5
+            return indicators.volatility(series)
         except Exception:
             return None
 
-    def compute_indicators(self, historical: Dict[str, List[float]], rsi_period: Optional[int] = None) -> Dict[str, Dict[str, Optional[float]]]:
+    def compute_indicators(self, historical: Dict[str, Sequence[float]], rsi_period: Optional[int] = None) -> Dict[str, Dict[str, Optional[float]]]:
+        """计算每个交易对的RSI、波动率以及区间涨跌幅与收益率特征（ret_mean/ret_std/last_momentum）"""
         try:
             if rsi_period is None:
-                try:
-                    rsi_period = int(os.getenv('RSI_PERIOD', '14'))
-                except Exception:
-                    rsi_period = 14
+                rsi_period = get_settings().rsi_period
             out: Dict[str, Dict[str, Optional[float]]] = {}
             for symbol, series in historical.items():
-                rsi = self._compute_rsi(series, period=rsi_period)
-                vol = self._compute_volatility(series)
-                out[symbol] = {"rsi": rsi, "volatility": vol}
+                arr = indicators.as_array(series)
+                digest = _series_digest(arr, rsi_period)
+                cached = _INDICATOR_CACHE.get(symbol)
+                if cached is not None and cached[0] == digest:
+                    out[symbol] = dict(cached[1])
+                    continue
+                ind: Dict[str, Optional[float]] = {
+                    "rsi": self._compute_rsi(arr, period=rsi_period),
+                    "volatility": self._compute_volatility(arr),
+                    "pct_change": indicators.pct_change(arr),
+                }
+                ind.update(indicators.return_features(arr))
+                _INDICATOR_CACHE[symbol] = (digest, ind)
+                out[symbol] = dict(ind)
             return out
         except Exception:
             return {}
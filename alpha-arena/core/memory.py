@@ -3,57 +3,194 @@
 """
 简单的交互记忆管理
 用于在多轮运行中保存最近的最终决策与下单结果，并在下一轮作为提示的上下文摘要。
+记忆文件为JSONL（每行一条记录），追加写入只写新行；读取时只保留末尾 max_items 条。
 """
 
 import os
 import json
-from typing import List, Dict, Any
+import threading
+from collections import deque
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
 
+from .config import DEFAULT_MEMORY_PATH, LEGACY_MEMORY_PATH, Settings, get_settings
 
-def _get_config() -> Dict[str, Any]:
-    """读取记忆相关配置（环境变量）。"""
-    path = os.getenv('MEMORY_FILE', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'memory.json'))
+# orjson解析/序列化更快；未安装时使用标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 文件锁仅在POSIX可用；Windows下只做进程内互斥
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# 文件行数超过 max_items 的该倍数时压缩为最近 max_items 条
+COMPACT_FACTOR = 4
+
+_write_lock = threading.Lock()
+# 各记忆文件的已知行数（用于判断是否需要压缩），未知时按需统计
+_line_counts: Dict[str, int] = {}
+
+
+def _get_config() -> Settings:
+    """读取记忆相关配置（进程内只解析一次环境变量）。"""
+    return get_settings()
+
+
+def _loads(raw: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw.decode('utf-8'))
+
+
+def _dump_line(record: Dict[str, Any]) -> bytes:
+    """序列化为单行UTF-8 JSON（含换行，numpy标量/数组按原生JSON写出）；orjson无法处理的对象退回标准库json"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(record, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY)
+        except TypeError:
+            pass
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+
+
+def _read_tail(f, max_items: int) -> Tuple[List[Dict[str, Any]], int]:
+    """从已打开的二进制文件读取末尾 max_items 条记录，返回(记录, 文件总行数)"""
+    head = f.read(64)
+    f.seek(0)
+    if head.lstrip().startswith(b'['):
+        data = _loads(f.read())
+        records = [r for r in data if isinstance(r, dict)] if isinstance(data, list) else []
+        return records[-max_items:], len(records)
+    total = 0
+    tail: deque = deque(maxlen=max_items)
+    for line in f:
+        if line.strip():
+            total += 1
+            tail.append(line)
+    records = []
+    for line in tail:
+        try:
+            rec = _loads(line)
+        except ValueError:
+            # 跳过写入中断导致的残缺行
+            continue
+        if isinstance(rec, dict):
+            records.append(rec)
+    return records, total
+
+
+@lru_cache(maxsize=4)
+def _load_parsed(path: str, mtime_ns: int, size: int, max_items: int) -> Tuple[Dict[str, Any], ...]:
+    """读取并解析记忆文件末尾；以(路径, 修改时间, 大小, 条数)为键缓存，文件未变化时不再重复读取与解析。"""
+    with open(path, 'rb') as f:
+        records, total = _read_tail(f, max_items)
+    _line_counts[path] = total
+    return tuple(records)
+
+
+def _migrate_legacy(path: str, max_items: int) -> None:
+    """
+    默认记忆文件由memory.json改为memory.jsonl：未设置MEMORY_FILE且新文件不存在时，
+    将旧文件的最近记录一次性转换为JSONL，避免升级后记忆（及冷却期依据的成交记录）为空
+    """
+    if path != DEFAULT_MEMORY_PATH or os.path.exists(path) or not os.path.exists(LEGACY_MEMORY_PATH):
+        return
+    tmp = f"{path}.{os.getpid()}.tmp"
     try:
-        max_items = int(os.getenv('MEMORY_MAX_ITEMS', '10'))
-    except Exception:
-        max_items = 10
-    enabled = (os.getenv('ENABLE_MEMORY', '0').strip() == '1')
-    return {"path": path, "max_items": max_items, "enabled": enabled}
+        with open(LEGACY_MEMORY_PATH, 'rb') as f:
+            records, _ = _read_tail(f, max_items * COMPACT_FACTOR)
+        with _write_lock:
+            if os.path.exists(path):
+                return
+            with open(tmp, 'wb') as f:
+                f.write(b"".join(_dump_line(r) for r in records))
+            os.replace(tmp, path)
+            _line_counts[path] = len(records)
+        print(f"ℹ️ 已将旧记忆文件 {LEGACY_MEMORY_PATH} 转换为 {path}（{len(records)} 条）")
+    except Exception as e:
+        print(f"⚠️ 旧记忆文件转换失败: {e}")
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
 
 
 def load_memory() -> List[Dict[str, Any]]:
-    """加载记忆列表（按时间顺序存储）。"""
+    """加载最近 max_items 条记忆（按时间顺序）。"""
     cfg = _get_config()
-    if not cfg["enabled"]:
+    if not cfg.memory_enabled:
         return []
-    path = cfg["path"]
-    if not os.path.exists(path):
+    path = cfg.memory_path
+    _migrate_legacy(path, max(1, cfg.memory_max))
+    try:
+        st = os.stat(path)
+    except OSError:
         return []
     try:
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            if isinstance(data, list):
-                return data
-            return []
+        # 缓存中的记录对象跨调用共享，返回浅拷贝，调用方修改记录不会影响后续结果
+        return [dict(r) for r in _load_parsed(path, st.st_mtime_ns, st.st_size, max(1, cfg.memory_max))]
     except Exception:
         return []
 
 
+def _compact(f, max_items: int, extra: Optional[bytes] = None) -> None:
+    """将已加锁的记忆文件原地重写为最近 max_items 条（JSONL格式），extra为需一并写入的新行"""
+    f.seek(0)
+    records, _ = _read_tail(f, max_items)
+    lines = [_dump_line(r) for r in records]
+    if extra is not None:
+        lines.append(extra)
+    lines = lines[-max_items:]
+    f.seek(0)
+    f.truncate()
+    f.write(b"".join(lines))
+    _line_counts[f.name] = len(lines)
+
+
 def append_memory(record: Dict[str, Any]) -> None:
-    """追加一条记忆记录，并按最大条数截断。"""
+    """追加一条记忆记录；文件行数超过 max_items*COMPACT_FACTOR 时压缩为最近 max_items 条。"""
     cfg = _get_config()
-    if not cfg["enabled"]:
+    if not cfg.memory_enabled:
         return
-    path = cfg["path"]
-    max_items = cfg["max_items"]
+    path = cfg.memory_path
+    max_items = max(1, cfg.memory_max)
+    _migrate_legacy(path, max_items)
     try:
-        current = load_memory()
-        current.append(record)
-        if len(current) > max_items:
-            # 保留最新的 max_items 条
-            current = current[-max_items:]
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(current, f, ensure_ascii=False, indent=2)
+        line = _dump_line(record)
+        with _write_lock, open(path, 'a+b') as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                # 旧版记忆文件为整体JSON数组（以'['开头），首次追加时转换为JSONL
+                f.seek(0)
+                if f.read(64).lstrip().startswith(b'['):
+                    _compact(f, max_items, extra=line)
+                    return
+                # 上次写入中断留下的残缺行没有换行符，先补齐，避免与新记录拼在同一行
+                size = f.seek(0, os.SEEK_END)
+                if size > 0:
+                    f.seek(size - 1)
+                    if f.read(1) != b"\n":
+                        line = b"\n" + line
+                f.write(line)
+                f.flush()
+                # 每轮只追加一次，落盘开销可忽略；确保进程异常退出后冷却期依据的成交记录不丢失
+                os.fsync(f.fileno())
+                count = _line_counts.get(path)
+                if count is None:
+                    f.seek(0)
+                    count = sum(1 for raw in f if raw.strip())
+                else:
+                    count += 1
+                _line_counts[path] = count
+                if count > max_items * COMPACT_FACTOR:
+                    _compact(f, max_items)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
     except Exception:
         # 记忆保存失败不影响主流程
-        pass
\ No newline at end of file
+        pass
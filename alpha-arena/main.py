@@ -7,9 +7,14 @@ Alpha Arena MVP - 主程序
 
 import os
 import sys
+import time
 from datetime import datetime
-from dotenv import load_dotenv
+from dotenv import find_dotenv, load_dotenv
 import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import FrozenSet, NamedTuple, Optional
 
 # 加载环境变量（以 .env 为准，允许覆盖终端环境）
 # 优先加载项目根目录 .env（包含交易所密钥等），再加载私密覆盖与本地覆盖，最后加载当前目录 .env
@@ -17,56 +22,176 @@ ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 ROOT_ENV_PATH = os.path.join(ROOT_DIR, '.env')
 PRIVATE_ENV_PATH = os.path.join(ROOT_DIR, '.env.private')
 LOCAL_ENV_PATH = os.path.join(ROOT_DIR, '.env.local')
-load_dotenv(dotenv_path=ROOT_ENV_PATH, override=True)
-load_dotenv(dotenv_path=PRIVATE_ENV_PATH, override=True)
-load_dotenv(dotenv_path=LOCAL_ENV_PATH, override=True)
-load_dotenv(override=True)
+# 不存在的文件直接跳过；当前目录 .env 若与已加载文件相同则不再重复加载（避免根目录 .env 反过来覆盖私密/本地覆盖）
+_loaded_env = set()
+for _env_path in (ROOT_ENV_PATH, PRIVATE_ENV_PATH, LOCAL_ENV_PATH, find_dotenv()):
+    if _env_path and os.path.abspath(_env_path) not in _loaded_env and os.path.exists(_env_path):
+        load_dotenv(dotenv_path=_env_path, override=True)
+        _loaded_env.add(os.path.abspath(_env_path))
 
 # 添加当前目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from core.market import MarketData
-from core.decision import DecisionMaker
+from core.decision import DecisionMaker, is_valid_plan
 from core.memory import append_memory, load_memory
-from adapters.deepseek_adapter import DeepSeekAdapter
-from adapters.qwen_adapter import QwenAdapter
+from core.config import Settings, get_settings
+from core.indicators import round_to_step_kernel
 
 # === 自动交易辅助函数 ===
 import math
+import numpy as np
 
 def _symbol_base(symbol: str) -> str:
     if symbol and symbol.endswith('USDT'):
         return symbol[:-4]
     return symbol or ''
 
+# 过滤器类型 -> 需要读取的字段（输出键与过滤器字段同名）
+_FILTER_FIELDS = {
+    'LOT_SIZE': ('stepSize', 'minQty'),
+    'MIN_NOTIONAL': ('minNotional',),
+    'NOTIONAL': ('minNotional',),
+}
+
 def _parse_symbol_filters(info: dict) -> dict:
     out = {}
     try:
         for f in info.get('filters', []):
-            ftype = f.get('filterType') or f.get('filter_type')
-            if ftype == 'LOT_SIZE':
-                out['stepSize'] = float(f.get('stepSize', '0') or 0)
-                out['minQty'] = float(f.get('minQty', '0') or 0)
-            elif ftype == 'MIN_NOTIONAL':
-                out['minNotional'] = float(f.get('minNotional', '0') or 0)
-            elif ftype == 'NOTIONAL':
-                out['minNotional'] = float(f.get('minNotional', '0') or 0)
+            fields = _FILTER_FIELDS.get(f.get('filterType') or f.get('filter_type'))
+            if fields:
+                for key in fields:
+                    out[key] = float(f.get(key, '0') or 0)
     except Exception:
         pass
     return out
 
+# 过滤器解析结果缓存 {symbol: (info, filters)}：交易对信息来自进程级缓存，未刷新（同一对象）时直接复用
+_filters_cache = {}
+
+def _symbol_filters(symbol: str, info: dict) -> dict:
+    cached = _filters_cache.get(symbol)
+    if cached is not None and cached[0] is info:
+        return cached[1]
+    filters = _parse_symbol_filters(info or {})
+    if info:
+        _filters_cache[symbol] = (info, filters)
+    return filters
+
 def _round_to_step(quantity: float, step_size: float) -> float:
+    # 类型与非有限值检查放在调用侧（JIT函数内不做异常处理），非法输入与原实现一样返回 max(0, quantity)
     try:
-        if step_size <= 0:
-            return quantity
-        steps = math.floor(quantity / step_size)
-        return max(0.0, steps * step_size)
+        quantity = float(quantity)
+        step_size = float(step_size)
+        if step_size > 0 and not math.isfinite(quantity / step_size):
+            return max(0.0, quantity)
+        return round_to_step_kernel(quantity, step_size)
     except Exception:
         return max(0.0, quantity)
 
+@dataclass
+class PlannedOrder:
+    """组合方案中的一笔订单：requested为计划数量（卖出）或USDT金额（买入），校验通过后size为实际下单值"""
+    side: str
+    symbol: str
+    requested: float
+    price: float = 0.0
+    filters: dict = field(default_factory=dict)
+    gating_reason: Optional[str] = None
+    size: float = 0.0
+
+    @property
+    def record_key(self) -> str:
+        return 'qty' if self.side == 'SELL' else 'usdt'
+
+class PlanMeta(NamedTuple):
+    """决策的结构摘要（每个模型决策解析一次，对比/共识/最终选择共用）"""
+    is_plan: bool
+    has_buy: bool
+    has_sell: bool
+    conf: float
+    buy_syms: FrozenSet[str]
+    sell_syms: FrozenSet[str]
+    valid: bool = False
+
+def _plan_syms(items) -> FrozenSet[str]:
+    return frozenset(x.get('symbol') for x in (items or []) if x.get('symbol'))
+
+def _plan_meta(d: dict) -> PlanMeta:
+    if not isinstance(d, dict):
+        return PlanMeta(False, False, False, 0.0, frozenset(), frozenset())
+    # 结构已校验的组合方案直接按键取值；其余（旧格式/结构不完整）逐项容错读取
+    if is_valid_plan(d):
+        buys, sells = d['buys'], d['sells']
+        return PlanMeta(True, bool(buys), bool(sells), float(d['confidence']),
+                        frozenset(x['symbol'] for x in buys), frozenset(x['symbol'] for x in sells), True)
+    return PlanMeta(
+        is_plan=("buys" in d) or ("sells" in d),
+        has_buy=bool(d.get('buys')),
+        has_sell=bool(d.get('sells')),
+        conf=float(d.get('confidence', 0.0) or 0.0),
+        buy_syms=_plan_syms(d.get('buys')),
+        sell_syms=_plan_syms(d.get('sells')),
+    )
+
+def _plan_conf_ok(meta: PlanMeta, cfg: Settings) -> bool:
+    """组合方案置信度是否达到阈值：同时含买卖时取两者较高阈值，空方案不执行"""
+    if meta.has_buy and meta.has_sell:
+        return meta.conf >= max(cfg.min_conf_buy, cfg.min_conf_sell)
+    elif meta.has_buy:
+        return meta.conf >= cfg.min_conf_buy
+    elif meta.has_sell:
+        return meta.conf >= cfg.min_conf_sell
+    else:
+        return False
+
+def _fmt_decision_summary(d: dict, meta: PlanMeta) -> str:
+    # 兼容组合方案与旧格式
+    if meta.is_plan:
+        if meta.valid:
+            buys_syms = [x['symbol'] for x in d['buys']]
+            sells_syms = [x['symbol'] for x in d['sells']]
+        else:
+            buys_syms = [x.get('symbol') for x in (d.get('buys') or []) if x.get('symbol')]
+            sells_syms = [x.get('symbol') for x in (d.get('sells') or []) if x.get('symbol')]
+        buys_str = ','.join(buys_syms) if buys_syms else '[]'
+        sells_str = ','.join(sells_syms) if sells_syms else '[]'
+        return f"PLAN buys={buys_str} | sells={sells_str} | conf={meta.conf:.2f}"
+    symbol = d.get('symbol', 'None')
+    action = d.get('action', 'HOLD')
+    return f"{action} {symbol} | conf={meta.conf:.2f}"
+
+_EMPTY_META = _plan_meta({})
+
+async def _gather_blocking(*calls):
+    """在默认线程池中并发执行多个阻塞调用（行情/账户/交易对信息互不依赖），按传入顺序返回结果"""
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(loop.run_in_executor(None, fn, *args) for fn, *args in calls))
 
-def main():
-    """主函数"""
+
+def _run_abandoning_threads(coro, workers: int):
+    """
+    在独立事件循环与专用线程池中运行协程，结束后不等待仍在执行的线程
+    asyncio.run退出时会等待默认线程池中的全部线程；wait_for超时后遗留的阻塞调用（线程池中的同步LLM请求等）无法被中断，
+    改为shutdown(wait=False)直接放弃，使超时真正不拖住下一轮
+    """
+    loop = asyncio.new_event_loop()
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='llm-decision')
+    loop.set_default_executor(pool)
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        try:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            pool.shutdown(wait=False)
+            loop.close()
+
+
+def main(cfg: Optional[Settings] = None):
+    """主函数（cfg缺省时使用进程级配置，自动运行模式下各轮复用同一份配置）"""
+    if cfg is None:
+        cfg = get_settings()
     print("🚀 Alpha Arena - 最简化MVP")
     print("=" * 50)
     print(f"📅 运行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -79,12 +204,14 @@ def main():
     args = parser.parse_args()
     
     # 计算实际使用的周期与窗口
-    interval_used = args.interval if args.interval else os.getenv('HIST_INTERVAL', '3m')
-    try:
-        limit_used = args.limit if args.limit is not None else int(os.getenv('HIST_LIMIT', '20'))
-    except Exception:
-        limit_used = args.limit if args.limit is not None else 20
+    interval_used = args.interval if args.interval else cfg.hist_interval
+    limit_used = args.limit if args.limit is not None else cfg.hist_limit
     
+    # 各出口只标记本轮是否需要写入记忆，统一在finally中追加一次；
+    # 已提交的订单（含response的记录）即使后续出错也必须落盘，否则冷却判断看不到这些成交
+    save_memory = False
+    op_records = []
+    run_record = None
     try:
         # 初始化市场数据管理器
         print("📊 初始化市场数据管理器...")
@@ -94,16 +221,19 @@ def main():
             print("❌ 交易所API不可用，请检查配置")
             return
         
-        # 获取实时价格
-        print("💰 获取实时价格...")
-        prices = market_data.get_current_prices()
+        # 实时价格、历史价格（可配置：周期与点数）与账户持仓互不依赖，并发获取，总耗时≈最慢的一次请求
+        print(f"💰 获取实时价格、历史价格({interval_used} x {limit_used})与账户持仓(现货)...")
+        # 持仓（free+locked）与各资产可用余额（free）在同一任务中取自同一账户快照，卖出时直接查表
+        prices, historical, (balances, free_map) = asyncio.run(_gather_blocking(
+            (market_data.get_current_prices,),
+            (market_data.get_historical_prices, interval_used, limit_used),
+            (market_data.get_account_balance_snapshot,),
+        ))
+        prices_ts = time.monotonic()
         
         print("\n📈 当前市场价格:")
         print(market_data.format_prices_for_display(prices))
         
-        # 获取历史价格（可配置：周期与点数）
-        print(f"\n🕒 获取历史价格({interval_used} x {limit_used})...")
-        historical = market_data.get_historical_prices(interval=interval_used, limit=limit_used)
         print("\n📉 历史价格预览:")
         print(market_data.format_historical_for_display(historical, max_points=8))
         # 计算技术指标
@@ -111,9 +241,6 @@ def main():
         indicators = market_data.compute_indicators(historical)
         print(market_data.format_indicators_for_display(indicators))
         
-        # 获取账户持仓
-        print("\n📦 获取账户持仓(现货)...")
-        balances = market_data.get_account_balances()
         print("\n💼 当前账户持仓:")
         print(market_data.format_balances_for_display(balances))
         
@@ -123,48 +250,20 @@ def main():
             print("❌ 没有获取到有效价格，请检查网络连接")
             return
 
-        # 读取策略与风控配置（来自 .env，可随时调整）
-        exec_policy = os.getenv('EXECUTION_POLICY', 'consensus').strip().lower()
-        try:
-            min_conf_buy = float(os.getenv('MIN_CONFIDENCE_BUY', '0.65'))
-        except Exception:
-            min_conf_buy = 0.65
-        try:
-            min_conf_sell = float(os.getenv('MIN_CONFIDENCE_SELL', '0.65'))
-        except Exception:
-            min_conf_sell = 0.65
-        try:
-            max_trade_usdt = float(os.getenv('MAX_TRADE_USDT', '20'))
-        except Exception:
-            max_trade_usdt = 20.0
-        try:
-            max_position_usdt = float(os.getenv('MAX_POSITION_USDT_PER_SYMBOL', '50'))
-        except Exception:
-            max_position_usdt = 50.0
-        trade_mode = os.getenv('TRADE_MODE', 'live').strip().lower()
-        # 新增：从 .env 读取决策来源（听哪个模型）。支持 deepseek 或 qwen，默认 deepseek
-        decision_model = (os.getenv('DECISION_MODEL', 'deepseek') or 'deepseek').strip().lower()
-        if decision_model not in ('deepseek', 'qwen'):
-            print(f"⚠️ DECISION_MODEL={decision_model} 非法，回退为 deepseek")
-            decision_model = 'deepseek'
-        consensus_require_both = (os.getenv('CONSENSUS_REQUIRE_BOTH', '1').strip() == '1')
+        # 策略与风控配置（来自 .env，进程内解析一次；需热更新时调用 core.config.reload_settings()）
+        exec_policy = cfg.execution_policy
+        min_conf_buy = cfg.min_conf_buy
+        min_conf_sell = cfg.min_conf_sell
+        max_trade_usdt = cfg.max_trade_usdt
+        max_position_usdt = cfg.max_position_usdt
+        trade_mode = cfg.trade_mode
+        decision_model = cfg.decision_model
+        consensus_require_both = cfg.consensus_require_both
         # 指标门控与冷却配置
-        try:
-            rsi_buy_max = float(os.getenv('RSI_BUY_MAX', '65'))
-        except Exception:
-            rsi_buy_max = 65.0
-        try:
-            rsi_sell_min = float(os.getenv('RSI_SELL_MIN', '35'))
-        except Exception:
-            rsi_sell_min = 35.0
-        try:
-            max_volatility = float(os.getenv('MAX_VOLATILITY', '0.12'))
-        except Exception:
-            max_volatility = 0.12
-        try:
-            cooldown_sec = int(os.getenv('TRADE_COOLDOWN_SEC', '300'))
-        except Exception:
-            cooldown_sec = 300
+        rsi_buy_max = cfg.rsi_buy_max
+        rsi_sell_min = cfg.rsi_sell_min
+        max_volatility = cfg.max_volatility
+        cooldown_sec = cfg.cooldown_sec
 
         mode_label = '监控' if exec_policy == 'monitor' else ('真实单' if trade_mode=='live' else '测试单')
         print(f"\n⚙️ 执行策略: {exec_policy} | BUY阈值={min_conf_buy:.2f} SELL阈值={min_conf_sell:.2f} | 单笔上限={max_trade_usdt:.2f} USDT | 单币持仓上限={max_position_usdt:.2f} USDT | 模式={mode_label}")
@@ -173,24 +272,36 @@ def main():
 
         # 初始化LLM适配器
         print("\n🤖 初始化AI模型...")
+        # 最终执行只听 DECISION_MODEL；另一模型仅用于对比日志，CONSENSUS_LOG=0 时不初始化也不请求
+        use_deepseek = cfg.consensus_log or decision_model == 'deepseek'
+        use_qwen = cfg.consensus_log or decision_model == 'qwen'
+        if not cfg.consensus_log:
+            print(f"ℹ️ CONSENSUS_LOG=0：跳过{'Qwen' if decision_model == 'deepseek' else 'DeepSeek'}，仅请求决策模型")
+        deepseek_decision_maker = None
+        qwen_decision_maker = None
         
         # DeepSeek适配器
-        try:
-            deepseek_adapter = DeepSeekAdapter()
-            deepseek_decision_maker = DecisionMaker(deepseek_adapter)
-            print(f"✅ DeepSeek ({deepseek_adapter.get_model_name()}) 初始化成功")
-        except Exception as e:
-            print(f"❌ DeepSeek初始化失败: {e}")
-            deepseek_decision_maker = None
+        if use_deepseek:
+            try:
+                # 适配器在使用时才导入，缺少对应SDK只影响该模型
+                from adapters.deepseek_adapter import DeepSeekAdapter
+                deepseek_adapter = DeepSeekAdapter()
+                deepseek_decision_maker = DecisionMaker(deepseek_adapter, symbols=market_data.get_symbols())
+                print(f"✅ DeepSeek ({deepseek_adapter.get_model_name()}) 初始化成功")
+            except Exception as e:
+                print(f"❌ DeepSeek初始化失败: {e}")
+                deepseek_decision_maker = None
         
         # Qwen适配器
-        try:
-            qwen_adapter = QwenAdapter()
-            qwen_decision_maker = DecisionMaker(qwen_adapter)
-            print(f"✅ Qwen ({qwen_adapter.get_model_name()}) 初始化成功")
-        except Exception as e:
-            print(f"❌ Qwen初始化失败: {e}")
-            qwen_decision_maker = None
+        if use_qwen:
+            try:
+                from adapters.qwen_adapter import QwenAdapter
+                qwen_adapter = QwenAdapter()
+                qwen_decision_maker = DecisionMaker(qwen_adapter, symbols=market_data.get_symbols())
+                print(f"✅ Qwen ({qwen_adapter.get_model_name()}) 初始化成功")
+            except Exception as e:
+                print(f"❌ Qwen初始化失败: {e}")
+                qwen_decision_maker = None
         
         if not deepseek_decision_maker and not qwen_decision_maker:
             print("❌ 没有可用的AI模型，请检查API密钥配置")
@@ -200,26 +311,35 @@ def main():
         print("\n🧠 获取AI交易决策...")
         
         decisions = {}
+        decision_makers = [
+            (name, maker)
+            for name, maker in (('DeepSeek', deepseek_decision_maker), ('Qwen', qwen_decision_maker))
+            if maker
+        ]
         
-        # DeepSeek决策
-        if deepseek_decision_maker:
-            print("\n🤖 DeepSeek决策:")
-            try:
-                deepseek_decision = deepseek_decision_maker.get_decision(prices, historical, balances)
-                decisions['DeepSeek'] = deepseek_decision
-                print(deepseek_decision_maker.format_decision_for_display(deepseek_decision))
-            except Exception as e:
-                print(f"❌ DeepSeek决策获取失败: {e}")
+        # 各模型决策互不依赖，使用同一份行情并发请求（asyncio.gather），总耗时≈最慢的单个模型；结果按固定顺序输出
+        # 自动运行模式下单个模型最长等待一个运行间隔，避免卡住的LLM请求拖住下一轮
+        decision_timeout = cfg.auto_run_interval_sec if cfg.auto_run and cfg.auto_run_interval_sec > 0 else None
+        async def _gather_decisions():
+            return await asyncio.gather(
+                *(asyncio.wait_for(maker.aget_decision(prices, historical, balances), timeout=decision_timeout)
+                  for _, maker in decision_makers),
+                return_exceptions=True,
+            )
         
-        # Qwen决策
-        if qwen_decision_maker:
-            print("\n🤖 Qwen决策:")
-            try:
-                qwen_decision = qwen_decision_maker.get_decision(prices, historical, balances)
-                decisions['Qwen'] = qwen_decision
-                print(qwen_decision_maker.format_decision_for_display(qwen_decision))
-            except Exception as e:
-                print(f"❌ Qwen决策获取失败: {e}")
+        # 每个模型最多同时占用两个线程（提示词/缓存读写 + 线程池回退的同步请求）
+        results = _run_abandoning_threads(_gather_decisions(), workers=max(2, 2 * len(decision_makers)))
+        for (name, maker), result in zip(decision_makers, results):
+            print(f"\n🤖 {name}决策:")
+            if isinstance(result, asyncio.TimeoutError):
+                print(f"❌ {name}决策超时（>{decision_timeout}s），本轮忽略")
+                continue
+            if isinstance(result, Exception):
+                print(f"❌ {name}决策获取失败: {result}")
+                continue
+            decisions[name] = result
+            print(maker.format_decision_for_display(result))
+        metas = {name: _plan_meta(d) for name, d in decisions.items()}
         
         # 决策对比
         if len(decisions) >= 2:
@@ -227,49 +347,19 @@ def main():
             print("-" * 30)
             
             for model_name, decision in decisions.items():
-                # 兼容组合方案与旧格式
-                def _fmt_model_decision_summary(d: dict) -> str:
-                    conf = float(d.get('confidence', 0.0) or 0.0)
-                    if isinstance(d, dict) and (('buys' in d) or ('sells' in d)):
-                        buys_syms = [x.get('symbol') for x in (d.get('buys') or []) if x.get('symbol')]
-                        sells_syms = [x.get('symbol') for x in (d.get('sells') or []) if x.get('symbol')]
-                        buys_str = ','.join(buys_syms) if buys_syms else '[]'
-                        sells_str = ','.join(sells_syms) if sells_syms else '[]'
-                        return f"PLAN buys={buys_str} | sells={sells_str} | conf={conf:.2f}"
-                    else:
-                        symbol = d.get('symbol', 'None')
-                        action = d.get('action', 'HOLD')
-                        return f"{action} {symbol} | conf={conf:.2f}"
-                print(f"   {model_name}: {_fmt_model_decision_summary(decision)}")
+                print(f"   {model_name}: {_fmt_decision_summary(decision, metas[model_name])}")
             
             # 检查是否一致（支持组合方案共识）
             if len(decisions) == 2:
                 d1 = decisions.get('DeepSeek', {})
                 d2 = decisions.get('Qwen', {})
-                def _is_plan_local(d: dict) -> bool:
-                    return isinstance(d, dict) and (("buys" in d) or ("sells" in d))
-                def _conf_ok_for_plan(d: dict) -> bool:
-                    conf = float(d.get('confidence', 0.0) or 0.0)
-                    has_buy = bool(d.get('buys'))
-                    has_sell = bool(d.get('sells'))
-                    if has_buy and has_sell:
-                        return conf >= max(min_conf_buy, min_conf_sell)
-                    elif has_buy:
-                        return conf >= min_conf_buy
-                    elif has_sell:
-                        return conf >= min_conf_sell
-                    else:
-                        return False
-                if _is_plan_local(d1) and _is_plan_local(d2):
-                    b1 = {x.get('symbol') for x in (d1.get('buys') or []) if x.get('symbol')}
-                    b2 = {x.get('symbol') for x in (d2.get('buys') or []) if x.get('symbol')}
-                    s1 = {x.get('symbol') for x in (d1.get('sells') or []) if x.get('symbol')}
-                    s2 = {x.get('symbol') for x in (d2.get('sells') or []) if x.get('symbol')}
-                    shared_buys = b1 & b2
-                    shared_sells = s1 & s2
-                    if b1 == b2 and s1 == s2:
-                        ok1 = _conf_ok_for_plan(d1)
-                        ok2 = _conf_ok_for_plan(d2)
+                m1 = metas.get('DeepSeek', _EMPTY_META)
+                m2 = metas.get('Qwen', _EMPTY_META)
+                if m1.is_plan and m2.is_plan:
+                    # 先判断是否完全一致，不一致时才计算交集
+                    if m1.buy_syms == m2.buy_syms and m1.sell_syms == m2.sell_syms:
+                        ok1 = _plan_conf_ok(m1, cfg)
+                        ok2 = _plan_conf_ok(m2, cfg)
                         if ok1 and ok2:
                             print("   🎯 两个AI在组合方案上完全一致（满足阈值）！")
                         elif ok1 or ok2:
@@ -279,48 +369,36 @@ def main():
                                 print("   🎯 两个AI在组合方案上完全一致（非严格），将执行置信度更高的一方方案")
                         else:
                             print("   🎯 两个AI在组合方案上完全一致，但均未达阈值，暂不执行")
-                    elif shared_buys or shared_sells:
-                        msg = []
-                        if shared_sells:
-                            msg.append(f"卖出共识: {', '.join(sorted(shared_sells))}")
-                        if shared_buys:
-                            msg.append(f"买入共识: {', '.join(sorted(shared_buys))}")
-                        print(f"   🎯 存在部分共识（{'; '.join(msg)}）")
                     else:
-                        print("   ⚡ 两个AI组合方案存在分歧")
+                        shared_buys = m1.buy_syms & m2.buy_syms
+                        shared_sells = m1.sell_syms & m2.sell_syms
+                        if shared_buys or shared_sells:
+                            msg = []
+                            if shared_sells:
+                                msg.append(f"卖出共识: {', '.join(sorted(shared_sells))}")
+                            if shared_buys:
+                                msg.append(f"买入共识: {', '.join(sorted(shared_buys))}")
+                            print(f"   🎯 存在部分共识（{'; '.join(msg)}）")
+                        else:
+                            print("   ⚡ 两个AI组合方案存在分歧")
                 else:
                     if (d1.get('symbol') == d2.get('symbol') and d1.get('action') == d2.get('action')):
                         print("   🎯 两个AI达成一致！")
                     else:
                         print("   ⚡ 两个AI意见分歧")
-            
-            # 选择最终执行决策（支持组合方案buys/sells）
-            def _is_plan(d: dict) -> bool:
-                return isinstance(d, dict) and (("buys" in d) or ("sells" in d))
-            
-            def _plan_conf_ok(d: dict) -> bool:
-                conf = float(d.get('confidence', 0.0) or 0.0)
-                has_buy = bool(d.get('buys'))
-                has_sell = bool(d.get('sells'))
-                if has_buy and has_sell:
-                    return conf >= max(min_conf_buy, min_conf_sell)
-                elif has_buy:
-                    return conf >= min_conf_buy
-                elif has_sell:
-                    return conf >= min_conf_sell
-                else:
-                    return False
-            
+        
+        # 选择最终执行决策（支持组合方案buys/sells）
         def _choose_final(decisions: dict) -> dict:
                 # 根据 DECISION_MODEL 选择模型：deepseek 或 qwen
                 model_key = 'DeepSeek' if decision_model == 'deepseek' else 'Qwen'
                 d = decisions.get(model_key, {})
-                if _is_plan(d) and _plan_conf_ok(d):
+                meta = metas.get(model_key, _EMPTY_META)
+                if meta.is_plan and _plan_conf_ok(meta, cfg):
                     print(f"   🎯 策略：仅听 {model_key} 的组合优化方案")
                     return d
                 # 回退到单一动作（仅所选模型）
                 sym, act = d.get('symbol'), d.get('action')
-                conf = float(d.get('confidence', 0.0) or 0.0)
+                conf = meta.conf
                 if act == 'BUY' and sym and conf >= min_conf_buy:
                     print(f"   🎯 策略：仅听 {model_key} 的单一BUY决策 {sym}")
                     return {'symbol': sym, 'action': 'BUY', 'confidence': conf}
@@ -334,60 +412,97 @@ def main():
         def _get_ind(symbol: str) -> tuple:
             ind = indicators.get(symbol) or {}
             return (ind.get('rsi'), ind.get('volatility'))
+        # 冷却索引：读取一次记忆，顺序遍历得到每个交易对最近一次实际执行（非监控）的时间（epoch秒）
+        # 优先使用记录中的ts，旧记录只有ISO时间戳时每条解析一次；无法解析时记为None，视为已过冷却期
+        last_exec_ts = {}
+        try:
+            for rec in load_memory():
+                iso_ts = rec.get('timestamp')
+                if not iso_ts:
+                    continue
+                ops = [op.get('symbol') for op in rec.get('results') or []
+                       if op.get('symbol') and op.get('ok') and not op.get('monitor_only')]
+                if not ops:
+                    continue
+                epoch = rec.get('ts')
+                if not isinstance(epoch, (int, float)):
+                    try:
+                        epoch = _dt.fromisoformat(iso_ts).timestamp()
+                    except Exception:
+                        epoch = None
+                for sym in ops:
+                    last_exec_ts[sym] = epoch
+        except Exception:
+            last_exec_ts = {}
         def _cooldown_ok(symbol: str) -> bool:
-            try:
-                mem = load_memory()
-                if not mem:
-                    return True
-                last_ts = None
-                for rec in reversed(mem):
-                    ts = rec.get('timestamp')
-                    res = rec.get('results') or []
-                    for op in res:
-                        if op.get('symbol') == symbol and op.get('ok') and not op.get('monitor_only'):
-                            last_ts = ts
-                            break
-                    if last_ts:
-                        break
-                if not last_ts:
-                    return True
-                try:
-                    last_dt = _dt.fromisoformat(last_ts)
-                except Exception:
-                    return True
-                delta = (_dt.now() - last_dt).total_seconds()
-                return delta >= cooldown_sec
-            except Exception:
+            last_epoch = last_exec_ts.get(symbol)
+            if last_epoch is None:
                 return True
+            return time.time() - last_epoch >= cooldown_sec
+        # 指标门控结果 {symbol: (rsi, vol, RSI超买, RSI超卖, 波动超限)}：一批交易对一次向量化比较阈值
+        # 缺失指标转为NaN，与阈值比较恒为False，即不拦截
+        gate_flags = {}
+        def _prepare_gating(symbols) -> None:
+            syms = [s for s in dict.fromkeys(symbols) if s not in gate_flags]
+            if not syms:
+                return
+            ind = np.array([_get_ind(s) for s in syms], dtype=np.float64).reshape(-1, 2)
+            rsi, vol = ind[:, 0], ind[:, 1]
+            rows = zip(syms, rsi.tolist(), vol.tolist(), (rsi > rsi_buy_max).tolist(),
+                       (rsi < rsi_sell_min).tolist(), (vol > max_volatility).tolist())
+            for s, *flags in rows:
+                gate_flags[s] = tuple(flags)
+        # 门控拦截记录 [(symbol, 原因)]：默认逐笔只记原因、结束时汇总输出一行；GATING_VERBOSE=1（或DEBUG=1）时逐笔输出明细
+        gating_skips = []
+        gating_verbose = cfg.gating_verbose
         def _gating_buy(symbol: str) -> bool:
-            rsi, vol = _get_ind(symbol)
-            if rsi is not None and rsi > rsi_buy_max:
-                print(f"⏸️ 指标门控：{symbol} RSI={rsi:.2f} > {rsi_buy_max:.2f}，跳过买入")
+            _prepare_gating((symbol,))
+            rsi, vol, rsi_high, _, vol_high = gate_flags[symbol]
+            if rsi_high:
+                gating_skips.append((symbol, 'RSI超买'))
+                if gating_verbose:
+                    print(f"⏸️ 指标门控：{symbol} RSI={rsi:.2f} > {rsi_buy_max:.2f}，跳过买入")
                 return False
-            if vol is not None and vol > max_volatility:
-                print(f"⏸️ 指标门控：{symbol} 波动={(vol*100):.2f}% > {(max_volatility*100):.2f}%，跳过买入")
+            if vol_high:
+                gating_skips.append((symbol, '波动超限'))
+                if gating_verbose:
+                    print(f"⏸️ 指标门控：{symbol} 波动={(vol*100):.2f}% > {(max_volatility*100):.2f}%，跳过买入")
                 return False
             if not _cooldown_ok(symbol):
-                print(f"⏸️ 冷却期未过：{symbol}，跳过买入")
+                gating_skips.append((symbol, '冷却期未过'))
+                if gating_verbose:
+                    print(f"⏸️ 冷却期未过：{symbol}，跳过买入")
                 return False
             return True
         def _gating_sell(symbol: str) -> bool:
-            rsi, vol = _get_ind(symbol)
-            if rsi is not None and rsi < rsi_sell_min:
-                print(f"⏸️ 指标门控：{symbol} RSI={rsi:.2f} < {rsi_sell_min:.2f}，跳过卖出")
+            _prepare_gating((symbol,))
+            rsi, vol, _, rsi_low, vol_high = gate_flags[symbol]
+            if rsi_low:
+                gating_skips.append((symbol, 'RSI超卖'))
+                if gating_verbose:
+                    print(f"⏸️ 指标门控：{symbol} RSI={rsi:.2f} < {rsi_sell_min:.2f}，跳过卖出")
                 return False
-            if vol is not None and vol > max_volatility:
-                print(f"⏸️ 指标门控：{symbol} 波动={(vol*100):.2f}% > {(max_volatility*100):.2f}%，跳过卖出")
+            if vol_high:
+                gating_skips.append((symbol, '波动超限'))
+                if gating_verbose:
+                    print(f"⏸️ 指标门控：{symbol} 波动={(vol*100):.2f}% > {(max_volatility*100):.2f}%，跳过卖出")
                 return False
             if not _cooldown_ok(symbol):
-                print(f"⏸️ 冷却期未过：{symbol}，跳过卖出")
+                gating_skips.append((symbol, '冷却期未过'))
+                if gating_verbose:
+                    print(f"⏸️ 冷却期未过：{symbol}，跳过卖出")
                 return False
             return True
 
         # 明确策略选择日志：仅听所选模型，忽略其他模型输出
         print(f"\n🔧 策略选择：仅听 {'DeepSeek' if decision_model=='deepseek' else 'Qwen'}（忽略其他模型输出）")
         final_decision = _choose_final(decisions)
-        op_records = []
+        run_record = {
+            "trade_mode": trade_mode,
+            "decision_model": decision_model,
+            "final_decision": final_decision,
+            "results": op_records
+        }
         # 调试输出：打印最终选择的决策结构，便于核对与模型输出是否一致
         try:
             print(f"\n🧭 最终选择的执行决策结构: {final_decision}")
@@ -397,20 +512,11 @@ def main():
             print("\n⏸️ 未满足执行条件，跳过交易")
             print("✅ 运行完成！")
             # 记录记忆（可选）
-            try:
-                append_memory({
-                    "timestamp": datetime.now().isoformat(timespec='seconds'),
-                    "trade_mode": trade_mode,
-                    "decision_model": decision_model,
-                    "final_decision": final_decision,
-                    "results": []
-                })
-            except Exception:
-                pass
+            save_memory = True
             return
 
         # 若为组合方案：执行sells再执行buys
-        if _is_plan(final_decision):
+        if _plan_meta(final_decision).is_plan:
             buys = final_decision.get('buys') or []
             sells = final_decision.get('sells') or []
             print("\n🚦 执行组合优化方案")
@@ -428,117 +534,156 @@ def main():
                 return
             # 估算USDT余额（先卖后买，卖出按当前价格估算USDT入账）
             remaining_usdt = float(balances.get('USDT', 0.0))
-            # 先执行卖出
+            # 方案涉及交易对的实时价格与过滤器信息在进入循环前一次并发预取、门控指标一次向量化比较，循环内直接查表
+            # 本轮批量价格仍新鲜时直接复用，否则（或缺失时）对需要的交易对一次批量刷新
+            plan_syms = list(dict.fromkeys(x.get('symbol') for x in sells + buys if x.get('symbol')))
+            price_map = {**prices}
+            prices_stale = time.monotonic() - prices_ts > cfg.price_max_age_sec
+            refresh_syms = [s for s in plan_syms if prices_stale or price_map.get(s, 0.0) <= 0]
+            fetched = asyncio.run(_gather_blocking(
+                *[(market_data.exchange_api.get_symbol_info, s) for s in plan_syms],
+                *([(market_data.exchange_api.get_latest_prices, refresh_syms)] if refresh_syms else []),
+            ))
+            plan_infos = dict(zip(plan_syms, fetched[:len(plan_syms)]))
+            if refresh_syms:
+                price_map.update(fetched[-1])
+            plan_prices = {s: price_map.get(s, 0.0) for s in plan_syms}
+            _prepare_gating(plan_syms)
+            test_order = trade_mode != 'live'
+            # 1) 构建订单列表（先卖后买），统一附上价格/过滤器并做指标与冷却门控
+            orders = []
             for s in sells:
                 sym = s.get('symbol')
                 qty_req = float(s.get('quantity') or 0.0)
-                if not sym or qty_req <= 0:
-                    continue
-                if not _gating_sell(sym):
-                    op_records.append({"op": "SELL", "symbol": sym, "qty": qty_req, "ok": True, "skipped": True, "reason": "gating"})
+                if sym and qty_req > 0:
+                    orders.append(PlannedOrder('SELL', sym, qty_req))
+            for b in buys:
+                sym = b.get('symbol')
+                # 允许 quote_usdt 缺失或为 0，后续使用余额与风控兜底
+                if sym:
+                    orders.append(PlannedOrder('BUY', sym, float(b.get('quote_usdt') or 0.0)))
+            for o in orders:
+                o.price = plan_prices.get(o.symbol, 0.0)
+                o.filters = _symbol_filters(o.symbol, plan_infos.get(o.symbol))
+                if not (_gating_sell if o.side == 'SELL' else _gating_buy)(o.symbol):
+                    o.gating_reason = gating_skips[-1][1]
+                    op_records.append({"op": o.side, "symbol": o.symbol, o.record_key: o.requested, "ok": True, "skipped": True, "reason": "gating"})
+            # 2) 卖出可行性校验：价格、可用余额（free，避免锁定仓位导致无法卖出）、步长与最小数量/名义额
+            ready_sells = []
+            for o in orders:
+                if o.side != 'SELL' or o.gating_reason:
                     continue
-                base = _symbol_base(sym)
-                current_price = market_data.get_price(sym)
-                if current_price <= 0:
+                sym = o.symbol
+                if o.price <= 0:
                     print(f"⏸️ 跳过卖出 {sym}: 无法获取当前价格")
                     continue
-                # 过滤器
-                sym_info = market_data.exchange_api.get_symbol_info(sym)
-                filters = _parse_symbol_filters(sym_info or {})
-                min_notional = filters.get('minNotional', 5.0)
-                step_size = filters.get('stepSize', 0.0)
-                min_qty = filters.get('minQty', 0.0)
-                # 使用可用余额（free）避免锁定仓位导致无法卖出
-                base_free = market_data.exchange_api.get_asset_free_balance(base)
+                min_notional = o.filters.get('minNotional', 5.0)
+                step_size = o.filters.get('stepSize', 0.0)
+                min_qty = o.filters.get('minQty', 0.0)
+                base = _symbol_base(sym)
+                base_free = free_map.get(base, 0.0)
                 base_total = float(balances.get(base, 0.0))
                 if base_free <= 0:
                     print(f"⏸️ 跳过卖出 {sym}: {base} 可用余额为0（total={base_total:g}），可能存在挂单或锁定")
                     continue
-                sell_qty = min(base_free, qty_req)
-                sell_qty = _round_to_step(sell_qty, step_size)
+                sell_qty = _round_to_step(min(base_free, o.requested), step_size)
                 if sell_qty <= 0:
                     print(f"⏸️ 跳过卖出 {sym}: 可卖数量不足")
                     continue
                 if min_qty > 0 and sell_qty < min_qty:
                     print(f"⏸️ 跳过卖出 {sym}: {sell_qty:g} < 最小数量 {min_qty:g}")
                     continue
-                if sell_qty * current_price < min_notional:
-                    print(f"⏸️ 跳过卖出 {sym}: 名义额 {sell_qty*current_price:.4f} < 最小名义额 {min_notional:.2f}")
+                if sell_qty * o.price < min_notional:
+                    print(f"⏸️ 跳过卖出 {sym}: 名义额 {sell_qty*o.price:.4f} < 最小名义额 {min_notional:.2f}")
                     continue
-                if exec_policy == 'monitor':
-                    print(f"👀 监控模式：拟卖出 {sym}, quantity={sell_qty:g}（不执行下单）")
-                    op_records.append({"op": "SELL", "symbol": sym, "qty": sell_qty, "ok": True, "monitor_only": True})
-                else:
-                    print(f"📤 卖出: {sym}, quantity={sell_qty:g}")
-                    res = market_data.exchange_api.place_market_sell_qty(sym, sell_qty, test=(trade_mode != 'live'))
+                o.size = sell_qty
+                ready_sells.append(o)
+            # 3) 卖出下单：监控模式只记录；否则并发提交，成功的卖单按当前价格估算USDT入账
+            if exec_policy == 'monitor':
+                for o in ready_sells:
+                    print(f"👀 监控模式：拟卖出 {o.symbol}, quantity={o.size:g}（不执行下单）")
+                    op_records.append({"op": "SELL", "symbol": o.symbol, "qty": o.size, "ok": True, "monitor_only": True})
+            elif ready_sells:
+                for o in ready_sells:
+                    print(f"📤 卖出: {o.symbol}, quantity={o.size:g}")
+                results = market_data.exchange_api.place_market_sells(
+                    [{"symbol": o.symbol, "quantity": o.size} for o in ready_sells], test=test_order)
+                for o, res in zip(ready_sells, results):
                     if res.get('ok'):
-                        est_usdt = sell_qty * current_price
+                        est_usdt = o.size * o.price
                         remaining_usdt += est_usdt
-                        print(f"✅ 卖单成功(或测试成功)，估算入账USDT: {est_usdt:.4f}")
-                        op_records.append({"op": "SELL", "symbol": sym, "qty": sell_qty, "ok": True, "response": res})
+                        # 同步本地余额快照，后续同币种买入按卖出后的持仓计算上限
+                        base = _symbol_base(o.symbol)
+                        balances[base] = float(balances.get(base, 0.0)) - o.size
+                        free_map[base] = max(0.0, free_map.get(base, 0.0) - o.size)
+                        balances['USDT'] = float(balances.get('USDT', 0.0)) + est_usdt
+                        print(f"✅ 卖单成功(或测试成功) {o.symbol}，估算入账USDT: {est_usdt:.4f}")
+                        op_records.append({"op": "SELL", "symbol": o.symbol, "qty": o.size, "ok": True, "response": res})
                     else:
-                        print(f"❌ 卖单提交失败: {res}")
-                        op_records.append({"op": "SELL", "symbol": sym, "qty": sell_qty, "ok": False, "response": res})
-            # 再执行买入
-            for b in buys:
-                sym = b.get('symbol')
-                quote_req = float(b.get('quote_usdt') or 0.0)
-                # 允许 quote_req 缺失或为 0，后续使用余额与风控兜底
-                if not sym:
+                        print(f"❌ 卖单提交失败 {o.symbol}: {res}")
+                        op_records.append({"op": "SELL", "symbol": o.symbol, "qty": o.size, "ok": False, "response": res})
+            # 4) 买入金额计算：按顺序占用USDT余额（监控模式不占用），并受单笔/单币持仓上限约束
+            buy_orders = []
+            for o in orders:
+                if o.side != 'BUY' or o.gating_reason:
                     continue
-                if not _gating_buy(sym):
-                    op_records.append({"op": "BUY", "symbol": sym, "usdt": quote_req, "ok": True, "skipped": True, "reason": "gating"})
-                    continue
-                base = _symbol_base(sym)
-                current_price = market_data.get_price(sym)
-                if current_price <= 0:
+                sym = o.symbol
+                if o.price <= 0:
                     # 回退使用批量价格结果
                     fallback_price = float(prices.get(sym, 0.0) or 0.0)
                     if fallback_price > 0:
-                        current_price = fallback_price
-                        print(f"ℹ️ 买入 {sym}: 使用回退价格 ${current_price:.6f}")
+                        o.price = fallback_price
+                        print(f"ℹ️ 买入 {sym}: 使用回退价格 ${o.price:.6f}")
                     else:
                         print(f"⏸️ 跳过买入 {sym}: 无法获取当前价格")
                         continue
-                sym_info = market_data.exchange_api.get_symbol_info(sym)
-                filters = _parse_symbol_filters(sym_info or {})
-                min_notional = filters.get('minNotional', 5.0)
-                # 当前该币种仓位USDT
+                buy_orders.append(o)
+            # 各币种当前仓位USDT（按卖出后的余额与本轮价格一次算好）
+            position_usdt = {_symbol_base(o.symbol): float(balances.get(_symbol_base(o.symbol), 0.0)) * o.price for o in buy_orders}
+            ready_buys = []
+            for o in buy_orders:
+                sym = o.symbol
+                min_notional = o.filters.get('minNotional', 5.0)
+                base = _symbol_base(sym)
                 base_qty = float(balances.get(base, 0.0))
-                current_pos_usdt = base_qty * current_price
-                # 可用USDT（剩余额度 + 风控）
-                # 若quote_req缺失或为0，兜底使用余额与风控限额
-                effective_quote = quote_req if quote_req > 0 else max(0.0, remaining_usdt)
+                current_pos_usdt = position_usdt[base]
+                # 若计划金额缺失或为0，兜底使用余额与风控限额
+                effective_quote = o.requested if o.requested > 0 else max(0.0, remaining_usdt)
                 buy_usdt = min(effective_quote, max_trade_usdt, max(0.0, max_position_usdt - current_pos_usdt), max(0.0, remaining_usdt))
-                print(f"🔎 买入检查 {sym}: 价格={current_price:.6f}, minNotional={min_notional:.2f}, USDT余额(估算)={remaining_usdt:.4f}, 当前{base}持仓={base_qty:g} (~{current_pos_usdt:.4f} USDT), 计划金额={quote_req:.4f}, 实际下单金额={buy_usdt:.4f}")
+                print(f"🔎 买入检查 {sym}: 价格={o.price:.6f}, minNotional={min_notional:.2f}, USDT余额(估算)={remaining_usdt:.4f}, 当前{base}持仓={base_qty:g} (~{current_pos_usdt:.4f} USDT), 计划金额={o.requested:.4f}, 实际下单金额={buy_usdt:.4f}")
                 if buy_usdt < max(min_notional, 1e-6):
                     print(f"⏸️ 跳过买入 {sym}: 金额 {buy_usdt:.4f} < 最小名义额 {min_notional:.2f} 或USDT不足")
                     continue
-                if exec_policy == 'monitor':
-                    print(f"👀 监控模式：拟买入 {sym}, quoteOrderQty={buy_usdt:.4f} USDT（不执行下单）")
-                    op_records.append({"op": "BUY", "symbol": sym, "usdt": buy_usdt, "ok": True, "monitor_only": True})
-                else:
-                    print(f"🛒 买入: {sym}, quoteOrderQty={buy_usdt:.4f} USDT")
-                    res = market_data.exchange_api.place_market_buy_usdt(sym, buy_usdt, test=(trade_mode != 'live'))
+                o.size = buy_usdt
+                if exec_policy != 'monitor':
+                    remaining_usdt -= buy_usdt
+                    # 同一币种的多笔买入累计计入持仓上限
+                    position_usdt[base] += buy_usdt
+                ready_buys.append(o)
+            # 5) 买入下单：监控模式只记录；否则并发提交，失败的买单退回占用的USDT
+            if exec_policy == 'monitor':
+                for o in ready_buys:
+                    print(f"👀 监控模式：拟买入 {o.symbol}, quoteOrderQty={o.size:.4f} USDT（不执行下单）")
+                    op_records.append({"op": "BUY", "symbol": o.symbol, "usdt": o.size, "ok": True, "monitor_only": True})
+            elif ready_buys:
+                for o in ready_buys:
+                    print(f"🛒 买入: {o.symbol}, quoteOrderQty={o.size:.4f} USDT")
+                results = market_data.exchange_api.place_market_buys(
+                    [{"symbol": o.symbol, "quote_usdt": o.size} for o in ready_buys], test=test_order)
+                for o, res in zip(ready_buys, results):
                     if res.get('ok'):
-                        remaining_usdt -= buy_usdt
-                        print(f"✅ 买单成功(或测试成功)，剩余USDT估算: {remaining_usdt:.4f}")
-                        op_records.append({"op": "BUY", "symbol": sym, "usdt": buy_usdt, "ok": True, "response": res})
+                        print(f"✅ 买单成功(或测试成功) {o.symbol}，金额: {o.size:.4f} USDT")
+                        op_records.append({"op": "BUY", "symbol": o.symbol, "usdt": o.size, "ok": True, "response": res})
                     else:
-                        print(f"❌ 买单提交失败: {res}")
-                        op_records.append({"op": "BUY", "symbol": sym, "usdt": buy_usdt, "ok": False, "response": res})
+                        remaining_usdt += o.size
+                        print(f"❌ 买单提交失败 {o.symbol}: {res}")
+                        op_records.append({"op": "BUY", "symbol": o.symbol, "usdt": o.size, "ok": False, "response": res})
+                print(f"   剩余USDT估算: {remaining_usdt:.4f}")
 
+            if gating_skips and not gating_verbose:
+                print(f"⏸️ 指标/冷却门控跳过 {len(gating_skips)} 笔: " + ", ".join(f"{s}({r})" for s, r in gating_skips))
             # 记录记忆（可选）
-            try:
-                append_memory({
-                    "timestamp": datetime.now().isoformat(timespec='seconds'),
-                    "trade_mode": trade_mode,
-                    "decision_model": decision_model,
-                    "final_decision": final_decision,
-                    "results": op_records
-                })
-            except Exception:
-                pass
+            save_memory = True
             print("\n✅ 组合方案执行完成！")
             return
 
@@ -557,43 +702,31 @@ def main():
         if not balances:
             print("❌ 无法获取账户持仓，自动执行中止")
             print("✅ 运行完成！")
-            try:
-                append_memory({
-                    "timestamp": datetime.now().isoformat(timespec='seconds'),
-                    "trade_mode": trade_mode,
-                    "decision_model": decision_model,
-                    "final_decision": final_decision,
-                    "results": op_records
-                })
-            except Exception:
-                pass
+            save_memory = True
             return
-        current_price = market_data.get_price(symbol)
+        # 当前价格与交易对过滤器（步长、最小名义额）；本轮批量价格仍新鲜时直接复用，否则与过滤器并发重新获取
+        if time.monotonic() - prices_ts <= cfg.price_max_age_sec and prices.get(symbol, 0.0) > 0:
+            current_price = prices[symbol]
+            sym_info = market_data.exchange_api.get_symbol_info(symbol)
+        else:
+            current_price, sym_info = asyncio.run(_gather_blocking(
+                (market_data.get_price, symbol),
+                (market_data.exchange_api.get_symbol_info, symbol),
+            ))
         if current_price <= 0:
             print("❌ 无法获取当前价格，自动执行中止")
             print("✅ 运行完成！")
-            try:
-                append_memory({
-                    "timestamp": datetime.now().isoformat(timespec='seconds'),
-                    "trade_mode": trade_mode,
-                    "decision_model": decision_model,
-                    "final_decision": final_decision,
-                    "results": op_records
-                })
-            except Exception:
-                pass
+            save_memory = True
             return
 
-        # 交易对过滤器（步长、最小名义额）
-        sym_info = market_data.exchange_api.get_symbol_info(symbol)
-        filters = _parse_symbol_filters(sym_info or {})
+        filters = _symbol_filters(symbol, sym_info)
         min_notional = filters.get('minNotional', 5.0)
         step_size = filters.get('stepSize', 0.0)
         min_qty = filters.get('minQty', 0.0)
 
         if action == 'BUY':
             if not _gating_buy(symbol):
-                print("⏸️ 指标/冷却门控未通过，跳过BUY")
+                print(f"⏸️ 指标/冷却门控未通过（{gating_skips[-1][1]}），跳过BUY")
                 print("✅ 运行完成！")
                 return
             usdt_bal = float(balances.get('USDT', 0.0))
@@ -620,10 +753,10 @@ def main():
                         op_records.append({"op": "BUY", "symbol": symbol, "usdt": buy_usdt, "ok": False, "response": res})
         elif action == 'SELL':
             if not _gating_sell(symbol):
-                print("⏸️ 指标/冷却门控未通过，跳过SELL")
+                print(f"⏸️ 指标/冷却门控未通过（{gating_skips[-1][1]}），跳过SELL")
                 print("✅ 运行完成！")
                 return
-            base_free = market_data.exchange_api.get_asset_free_balance(base)
+            base_free = free_map.get(base, 0.0)
             base_total = float(balances.get(base, 0.0))
             if base_free <= 0:
                 print(f"⏸️ 当前无可用持仓可卖出（free=0, total={base_total:g}），跳过")
@@ -649,46 +782,47 @@ def main():
 
 
         # 记录记忆（可选）
-        try:
-            append_memory({
-                "timestamp": datetime.now().isoformat(timespec='seconds'),
-                "trade_mode": trade_mode,
-                "decision_model": decision_model,
-                "final_decision": final_decision,
-                "results": op_records
-            })
-        except Exception:
-            pass
+        save_memory = True
         print("\n✅ 运行完成！")
         
     except KeyboardInterrupt:
         print("\n\n⏹️ 用户中断程序")
         # 若开启自动运行模式，则将中断向外抛出以便外层循环停止
-        if os.getenv('AUTO_RUN', '0') == '1':
+        if cfg.auto_run:
             raise
     except Exception as e:
         print(f"\n❌ 程序运行出错: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        if run_record is not None and (save_memory or any("response" in r for r in op_records)):
+            try:
+                now = datetime.now()
+                # ts为epoch秒，供冷却判断直接做整数比较
+                append_memory({"timestamp": now.isoformat(timespec='seconds'), "ts": int(now.timestamp()), **run_record})
+            except Exception:
+                pass
 
 
 if __name__ == "__main__":
     # 支持通过环境变量启用自动运行
     # AUTO_RUN=1 开启自动运行；AUTO_RUN_INTERVAL_SEC 指定间隔秒数（默认60）
-    auto = os.getenv('AUTO_RUN', '0') == '1'
-    interval_sec_str = os.getenv('AUTO_RUN_INTERVAL_SEC', '60')
-    try:
-        interval_sec = int(interval_sec_str)
-    except Exception:
-        interval_sec = 60
-    if auto:
-        import time
+    cfg = get_settings()
+    interval_sec = cfg.auto_run_interval_sec
+    if cfg.auto_run:
         print(f"⏳ 自动运行模式已开启，每 {interval_sec} 秒运行一次。按 Ctrl+C 停止。")
         try:
+            # 按单调时钟的固定节拍运行：本轮耗时从间隔中扣除，避免 运行耗时+间隔 逐轮累积漂移
+            next_tick = time.monotonic()
             while True:
-                main()
-                time.sleep(interval_sec)
+                main(cfg)
+                next_tick += interval_sec
+                now = time.monotonic()
+                if next_tick <= now:
+                    # 本轮超过间隔：跳过错过的节拍，从当前时刻重新对齐，避免连续补跑
+                    next_tick = now + interval_sec
+                time.sleep(max(0.0, next_tick - now))
         except KeyboardInterrupt:
             print("\n⏹️ 已停止自动运行")
     else:
-        main()
+        main(cfg)